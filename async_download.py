@@ -0,0 +1,200 @@
+import argparse
+import asyncio
+import os
+import time
+
+import ccxt.async_support as ccxt_async
+import pandas as pd
+
+import dataset
+import download_data
+import symbols
+
+# Binance USD-M futures: 2400 request weight per minute per IP, and a klines
+# request with limit > 1000 costs 10. Leave headroom for other clients.
+WEIGHT_PER_MINUTE = 2000
+REQUEST_WEIGHT = 10
+
+# Pages fetched one after another inside a chunk; chunks run concurrently.
+CHUNK_MINUTES = download_data.limit * 10
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, bursts up to ``capacity``.
+
+    One bucket is shared by every request so the combined weight of all
+    concurrent chunks stays within the exchange budget. Waiters are served
+    in arrival order.
+    """
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = asyncio.Lock()
+
+    async def acquire(self, weight=1):
+        async with self.lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= weight:
+                    self.tokens -= weight
+                    return
+                await asyncio.sleep((weight - self.tokens) / self.rate)
+
+
+def make_async_exchange():
+    # Requests are throttled by TokenBucket instead of ccxt's per-instance limiter.
+    return ccxt_async.binance({
+        "enableRateLimit": False,
+        "options": {
+            "defaultType": "future"
+        }
+    })
+
+
+def time_chunks(start, now, chunk_minutes=CHUNK_MINUTES):
+    """Split candle open times [start, now] ms into epoch-aligned chunks.
+
+    Returns (grid_start, start, end, complete) tuples. ``complete`` chunks
+    only hold candles that had closed by ``now``, so they never change and
+    can be kept across restarts.
+    """
+    step = chunk_minutes * 60_000
+    end = now + 60_000
+    chunks = []
+    grid = start // step * step
+    while grid < end:
+        chunks.append((grid, max(start, grid), min(grid + step, end), grid + step <= now))
+        grid += step
+    return chunks
+
+
+async def fetch_chunk(exchange, bucket, symbol, start, end):
+    candles = []
+    since = start
+    while since < end:
+        await bucket.acquire(REQUEST_WEIGHT)
+        page = await exchange.fetch_ohlcv(
+            symbol=symbol,
+            timeframe=download_data.timeframe,
+            since=since,
+            limit=download_data.limit
+        )
+        page = [candle for candle in page if candle[0] < end]
+        if not page:
+            break
+        candles.extend(page)
+        since = page[-1][0] + 60_000
+    return candles
+
+
+def chunk_part(grid, complete):
+    return f"chunk-{grid}.parquet" if complete else "tail.parquet"
+
+
+async def download_symbols(
+    symbol_list,
+    exchange=None,
+    concurrency=8,
+    weight_per_minute=WEIGHT_PER_MINUTE,
+    months=download_data.months_of_data,
+    dataset_dir=dataset.DATASET_DIR,
+    chunk_minutes=CHUNK_MINUTES,
+):
+    """Download several symbols with up to ``concurrency`` chunk requests in flight.
+
+    Each symbol's missing range (after its stored file, or ``months`` back)
+    is split into time chunks. Completed chunks are saved as part files, so a
+    rerun skips them, and are then merged into the month partitions in time
+    order. Returns the report_missing summary per symbol.
+    """
+    own_exchange = exchange is None
+    exchange = exchange or make_async_exchange()
+
+    rate = weight_per_minute / 60
+    bucket = TokenBucket(rate, capacity=REQUEST_WEIGHT * concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    now = exchange.milliseconds()
+    default_start = pd.Timestamp(now, unit="ms", tz="UTC") - pd.DateOffset(months=months)
+    default_start = int(default_start.timestamp() * 1000)
+
+    jobs = []
+    for symbol in symbol_list:
+        if not dataset.has_dataset(symbol, dataset_dir) and os.path.exists(dataset.flat_path(symbol, dataset_dir)):
+            dataset.migrate(symbol, dataset_dir)
+        partial = download_data.partial_dir(symbol, dataset_dir)
+        os.makedirs(partial, exist_ok=True)
+        start = download_data.last_stored_ms(symbol, dataset_dir) or default_start
+        for grid, chunk_start, chunk_end, complete in time_chunks(start, now, chunk_minutes):
+            part = os.path.join(partial, chunk_part(grid, complete))
+            if complete and os.path.exists(part):
+                continue
+            jobs.append((symbol, chunk_start, chunk_end, part))
+
+    async def run(symbol, chunk_start, chunk_end, part):
+        async with semaphore:
+            candles = await fetch_chunk(exchange, bucket, symbol, chunk_start, chunk_end)
+        download_data.candles_to_frame(candles).to_parquet(part)
+
+    try:
+        await asyncio.gather(*(run(*job) for job in jobs))
+    finally:
+        if own_exchange:
+            await exchange.close()
+
+    stored = {}
+    for symbol in symbol_list:
+        # Chunk names sort by start time; the open-ended tail chunk goes last.
+        names = os.listdir(download_data.partial_dir(symbol, dataset_dir))
+        parts = sorted(
+            (name for name in names if name.endswith(".parquet")),
+            key=lambda name: (name == "tail.parquet", name),
+        )
+        download_data.merge_parts(symbol, parts, dataset_dir)
+        stored[symbol] = download_data.report_missing(symbol, dataset_dir)
+    return stored
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Concurrent 1m OHLCV download for many symbols under one rate-limit budget."
+    )
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols, e.g. BTC/USDT,ETH/USDT. Each is saved to its own raw file.",
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        default=download_data.months_of_data,
+        help="History to fetch for a symbol without a stored file.",
+    )
+    parser.add_argument("--concurrency", type=int, default=8, help="Chunks downloaded at the same time.")
+    parser.add_argument(
+        "--weight-per-minute",
+        type=float,
+        default=WEIGHT_PER_MINUTE,
+        help="Request weight budget shared by all requests.",
+    )
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        raise ValueError("--concurrency must be >= 1")
+
+    asyncio.run(download_symbols(
+        args.symbols,
+        concurrency=args.concurrency,
+        weight_per_minute=args.weight_per_minute,
+        months=args.months,
+    ))
+
+
+if __name__ == "__main__":
+    main()
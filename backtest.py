@@ -74,22 +74,12 @@ def _print_backtest_results(metrics, label=None):
     print("Max drawdown:", round(metrics["Max drawdown"], 4))
 
 
-def run_backtest(
-    tp_pct=None,
-    prob_threshold=None,
-    trades_path="data/results/trades.parquet",
-    leverage_hint=1.0,
-    print_results=True,
-    label=None,
-):
-    _ = (tp_pct, prob_threshold)  # kept for call parity with existing sweep code
-
-    trades = pd.read_parquet(trades_path)
+def compute_backtest_metrics(trades, leverage_hint=1.0):
     total_trades = len(trades)
     leverage_used = _resolve_leverage_used(trades, leverage_hint)
 
     if total_trades == 0:
-        metrics = {
+        return {
             "Total trades": 0,
             "Win rate": 0,
             "Profit factor": 0,
@@ -98,9 +88,6 @@ def run_backtest(
             "Max drawdown": 0,
             "Leverage Used": leverage_used,
         }
-        if print_results:
-            _print_backtest_results(metrics, label=label)
-        return metrics
 
     if "equity" not in trades.columns:
         trades["equity"] = (1 + trades["pnl"]).cumprod()
@@ -120,7 +107,7 @@ def run_backtest(
     final_equity = trades["equity"].iloc[-1]
     max_dd = trades["drawdown"].min()
 
-    metrics = {
+    return {
         "Total trades": total_trades,
         "Win rate": win_rate,
         "Profit factor": profit_factor,
@@ -130,6 +117,23 @@ def run_backtest(
         "Leverage Used": leverage_used,
     }
 
+
+def run_backtest(
+    tp_pct=None,
+    prob_threshold=None,
+    trades_path="data/results/trades.parquet",
+    leverage_hint=1.0,
+    print_results=True,
+    label=None,
+    trades=None,
+):
+    _ = (tp_pct, prob_threshold)  # kept for call parity with existing sweep code
+
+    if trades is None:
+        trades = pd.read_parquet(trades_path)
+
+    metrics = compute_backtest_metrics(trades, leverage_hint=leverage_hint)
+
     if print_results:
         _print_backtest_results(metrics, label=label)
 
@@ -0,0 +1,875 @@
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import log_loss
+
+import async_download
+import dataset
+import download_data
+import features
+import gaps
+import inference
+import kernels
+import labeling
+import model_registry
+import purged_cv
+import simulation
+import train_test_split
+import train_xgboost
+import tune_xgboost
+import walk_forward
+
+
+def synthetic_ohlcv(rows, seed=42):
+    rng = np.random.default_rng(seed)
+    index = pd.date_range("2024-01-01", periods=rows, freq="1min", tz="UTC", name="timestamp")
+
+    close = 60000 * np.exp(np.cumsum(rng.normal(0, 0.0012, rows)))
+    open_ = np.concatenate([[close[0]], close[:-1]])
+    high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.0008, rows)))
+    low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.0008, rows)))
+    volume = rng.gamma(2.0, 50.0, rows)
+
+    return pd.DataFrame(
+        {"open": open_, "high": high, "low": low, "close": close, "volume": volume},
+        index=index,
+    )
+
+
+class FakeExchange:
+    """Local stand-in for a ccxt exchange serving candles from DataFrames.
+
+    ``data`` is one OHLCV frame served for every symbol, or a dict of frames
+    by symbol. ``fail_after`` raises ConnectionError after that many
+    fetch_ohlcv calls to simulate an interrupted download.
+    """
+
+    def __init__(self, data, latency=0.0, fail_after=None):
+        frames = data if isinstance(data, dict) else {None: data}
+        self.candles = {
+            symbol: (df.index.as_unit("ms").asi8, df[["open", "high", "low", "close", "volume"]].to_numpy())
+            for symbol, df in frames.items()
+        }
+        self.now = max(int(times[-1]) for times, _ in self.candles.values()) + 60_000
+        self.rateLimit = 0
+        self.latency = latency
+        self.fail_after = fail_after
+        self.calls = 0
+
+    def milliseconds(self):
+        return self.now
+
+    def _page(self, symbol, since, limit):
+        self.calls += 1
+        if self.fail_after is not None and self.calls > self.fail_after:
+            raise ConnectionError("simulated network failure")
+        times, rows = self.candles.get(symbol) or self.candles[None]
+        start = np.searchsorted(times, since or 0)
+        return [[int(t), *row] for t, row in zip(times[start:start + limit], rows[start:start + limit])]
+
+    def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=1500):
+        if self.latency:
+            time.sleep(self.latency)
+        return self._page(symbol, since, limit)
+
+
+class AsyncFakeExchange(FakeExchange):
+    """Async FakeExchange; records request start times to check the rate limiter."""
+
+    def __init__(self, data, latency=0.0):
+        super().__init__(data, latency)
+        self.request_times = []
+
+    async def fetch_ohlcv(self, symbol, timeframe="1m", since=None, limit=1500):
+        self.request_times.append(time.monotonic())
+        await asyncio.sleep(self.latency)
+        return self._page(symbol, since, limit)
+
+    async def close(self):
+        pass
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def bench_labeling(args):
+    df = synthetic_ohlcv(args.rows)
+    print(f"Rows: {len(df):,} | TP={args.tp} | SL={labeling.SL_PCT} | MAX_HOLD={labeling.MAX_HOLD}")
+
+    labels, vec_seconds = timed(labeling.label_entries, df, df.index, args.tp)
+    print(f"Vectorized: {vec_seconds:.3f}s ({len(df) / vec_seconds:,.0f} rows/s)")
+
+    # The legacy labeler is far too slow for the full range, so time it on an
+    # evenly spaced sample and extrapolate.
+    sample = df.index[np.linspace(0, len(df) - 1, args.legacy_rows).astype(int)]
+    legacy, legacy_seconds = timed(
+        lambda: [labeling.label_trade(df, ts, args.tp) for ts in sample]
+    )
+    legacy_rate = len(sample) / legacy_seconds
+    print(
+        f"Legacy:     {legacy_seconds:.3f}s on {len(sample):,} rows "
+        f"({legacy_rate:,.0f} rows/s, ~{len(df) / legacy_rate:,.0f}s extrapolated)"
+    )
+    print(f"Speedup:    ~{(len(df) / legacy_rate) / vec_seconds:,.0f}x")
+
+    mismatches = int((labels.loc[sample].values != np.asarray(legacy)).sum())
+    print("Parity mismatches:", mismatches)
+    return mismatches == 0
+
+
+def legacy_exits(df, entry_times, tp_pct, sl_pct=labeling.SL_PCT, max_hold=labeling.MAX_HOLD):
+    # Per-signal slice + iterrows() scan formerly used by both simulation scripts.
+    trades = []
+    for entry_time in entry_times:
+        entry_price = df.loc[entry_time, "close"]
+        tp_price = entry_price * (1 + tp_pct)
+        sl_price = entry_price * (1 - sl_pct)
+
+        future = df.loc[entry_time:].iloc[1 : max_hold + 1]
+        if future.empty:
+            continue
+
+        exit_price = None
+        exit_time = None
+        result = "timeout"
+
+        for ts, row in future.iterrows():
+            if row["high"] >= tp_price:
+                exit_price, exit_time, result = tp_price, ts, "tp"
+                break
+            if row["low"] <= sl_price:
+                exit_price, exit_time, result = sl_price, ts, "sl"
+                break
+
+        if exit_price is None:
+            exit_price = future.iloc[-1]["close"]
+            exit_time = future.index[-1]
+
+        trades.append({
+            "entry_time": entry_time,
+            "exit_time": exit_time,
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "result": result,
+        })
+    return pd.DataFrame(trades)
+
+
+def bench_exits(args):
+    df = synthetic_ohlcv(args.rows)
+    rng = np.random.default_rng(7)
+    entry_times = df.index[rng.random(len(df)) < args.signal_rate]
+    print(f"Rows: {len(df):,} | Signals: {len(entry_times):,} ({args.signal_rate:.0%}) | TP={args.tp}")
+
+    exits, vec_seconds = timed(simulation.resolve_exits, df, entry_times, args.tp)
+    print(f"Vectorized: {vec_seconds:.3f}s ({len(entry_times) / vec_seconds:,.0f} signals/s)")
+
+    sample = entry_times[: args.legacy_signals]
+    legacy, legacy_seconds = timed(legacy_exits, df, sample, args.tp)
+    legacy_rate = len(sample) / legacy_seconds
+    print(
+        f"Legacy:     {legacy_seconds:.3f}s on {len(sample):,} signals "
+        f"({legacy_rate:,.0f} signals/s, ~{len(entry_times) / legacy_rate:,.0f}s extrapolated)"
+    )
+    print(f"Speedup:    ~{(len(entry_times) / legacy_rate) / vec_seconds:,.0f}x")
+
+    expected = exits.iloc[: len(legacy)].reset_index(drop=True)
+    try:
+        pd.testing.assert_frame_equal(expected, legacy, check_exact=True, check_dtype=False)
+    except AssertionError as exc:
+        print("Parity check failed:", exc)
+        return False
+    print("Parity: trade logs identical on sample")
+    return True
+
+
+def bench_features_stream(args):
+    df = synthetic_ohlcv(args.rows)
+    lookback = max(args.lookback, features.htf_warmup_bars(args.timeframes))
+    print(f"Rows: {len(df):,} | Live lookback: {lookback} | Timeframes: {args.timeframes or 'none'}")
+
+    batch, batch_seconds = timed(features.build_features, df, args.timeframes)
+
+    engine = features.StreamingFeatures(args.timeframes)
+    streamed = {}
+    candles = df[["open", "high", "low", "close", "volume"]].itertuples(index=True)
+    start = time.perf_counter()
+    for ts, *candle in candles:
+        row = engine.update(*candle, timestamp=ts)
+        if row is not None:
+            streamed[ts] = row
+    stream_seconds = time.perf_counter() - start
+    streamed = pd.DataFrame.from_dict(streamed, orient="index", columns=engine.columns)
+
+    # Previous live path: rebuild every feature over the lookback on each tick.
+    window = df.iloc[-lookback:]
+    ticks = 200
+    _, recompute_seconds = timed(
+        lambda: [features.build_features(window, args.timeframes) for _ in range(ticks)]
+    )
+
+    print(f"Batch build_features:  {batch_seconds:.3f}s")
+    print(f"Streaming update:      {stream_seconds / len(df) * 1e6:,.1f} us/candle")
+    print(f"Lookback recompute:    {recompute_seconds / ticks * 1e6:,.1f} us/candle")
+
+    if not streamed.index.equals(batch.index):
+        print("Parity check failed: streaming and batch rows differ")
+        return False
+
+    rel_err = ((streamed - batch).abs().max() / batch.abs().max().replace(0, 1)).max()
+    print(f"Parity: max relative error {rel_err:.2e}")
+    return rel_err < 1e-9
+
+
+def bench_download(args):
+    df = synthetic_ohlcv(args.rows)
+    expected = df.copy()
+    expected.index = expected.index.as_unit("ms")
+    print(f"Rows: {len(df):,} | Flush every: {args.flush_every:,} candles")
+
+    def run(dataset_dir, exchange):
+        download_data.download_symbol(
+            "BTC/USDT", exchange, dataset_dir, months=60, flush_every=args.flush_every, show_progress=False
+        )
+        return dataset.load_ohlcv("BTC/USDT", dataset_dir=dataset_dir)
+
+    def peak_memory(rows, dataset_dir):
+        # Download only: the exchange holds its candles before tracing starts.
+        exchange = FakeExchange(synthetic_ohlcv(rows))
+        tracemalloc.start()
+        download_data.download_symbol(
+            "BTC/USDT", exchange, dataset_dir, months=60, flush_every=args.flush_every, show_progress=False
+        )
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return peak
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        full_exchange = FakeExchange(df)
+        full, full_seconds = timed(run, os.path.join(tmp, "full"), full_exchange)
+
+        # Incremental: a dataset with the first 70% of candles only fetches the rest.
+        path = os.path.join(tmp, "incremental")
+        dataset.write_partitions(df.iloc[:int(len(df) * 0.7)].reset_index(), "BTC/USDT", path)
+        incremental_exchange = FakeExchange(df)
+        incremental, incremental_seconds = timed(run, path, incremental_exchange)
+
+        # Resume: fail part-way, then rerun against a healthy exchange.
+        path = os.path.join(tmp, "resumed")
+        failing = FakeExchange(df, fail_after=len(df) // download_data.limit // 2)
+        try:
+            run(path, failing)
+        except ConnectionError:
+            print(f"Interrupted after {failing.calls - 1} requests; checkpoint kept")
+        resume_exchange = FakeExchange(df)
+        resumed = run(path, resume_exchange)
+
+        small_peak = peak_memory(len(df) // 4, os.path.join(tmp, "small"))
+        large_peak = peak_memory(len(df), os.path.join(tmp, "large"))
+
+    print(f"Full download:        {full_seconds:.3f}s, {full_exchange.calls} requests")
+    print(f"Incremental download: {incremental_seconds:.3f}s, {incremental_exchange.calls} requests")
+    print(f"Resumed download:     {resume_exchange.calls} requests after restart")
+    print(
+        f"Peak traced memory:   {small_peak / 2**20:.1f} MB for {len(df) // 4:,} candles, "
+        f"{large_peak / 2**20:.1f} MB for {len(df):,}"
+    )
+
+    for name, result in (("full", full), ("incremental", incremental), ("resumed", resumed)):
+        result.index = result.index.as_unit("ms")
+        if not result.equals(expected):
+            print(f"Parity check failed: {name} download differs from the source candles")
+            ok = False
+    if ok:
+        print("Parity: full, incremental and resumed downloads match the source candles")
+    # Memory is bounded by the flush size and one month, not by the range.
+    if large_peak > 1.5 * small_peak:
+        print("Memory check failed: peak memory grows with the downloaded range")
+        ok = False
+    return ok
+
+
+def bench_download_async(args):
+    symbol_list = [f"SYM{i}/USDT" for i in range(args.symbols)]
+    sources = {symbol: synthetic_ohlcv(args.rows, seed=i) for i, symbol in enumerate(symbol_list)}
+    print(
+        f"Symbols: {args.symbols} | Rows per symbol: {args.rows:,} | Latency: {args.latency * 1000:.0f} ms"
+        f" | Concurrency: {args.concurrency} | Budget: {args.weight_per_minute:,.0f} weight/min"
+    )
+
+    with tempfile.TemporaryDirectory() as tmp:
+        sync_exchange = FakeExchange(sources, latency=args.latency)
+
+        def sequential():
+            return {
+                symbol: download_data.download_symbol(
+                    symbol,
+                    sync_exchange,
+                    os.path.join(tmp, "sequential"),
+                    months=args.months,
+                    show_progress=False,
+                )
+                for symbol in symbol_list
+            }
+
+        exchange = AsyncFakeExchange(sources, latency=args.latency)
+
+        def concurrent():
+            return asyncio.run(async_download.download_symbols(
+                symbol_list,
+                exchange,
+                concurrency=args.concurrency,
+                weight_per_minute=args.weight_per_minute,
+                months=args.months,
+                dataset_dir=os.path.join(tmp, "concurrent"),
+                chunk_minutes=args.chunk_minutes,
+            ))
+
+        _, seq_seconds = timed(sequential)
+        _, conc_seconds = timed(concurrent)
+        seq = {symbol: dataset.load_ohlcv(symbol, dataset_dir=os.path.join(tmp, "sequential")) for symbol in symbol_list}
+        conc = {symbol: dataset.load_ohlcv(symbol, dataset_dir=os.path.join(tmp, "concurrent")) for symbol in symbol_list}
+
+    times = np.array(sorted(exchange.request_times))
+    window = 60.0 * args.window_fraction
+    in_window = np.searchsorted(times, times + window) - np.arange(len(times))
+    peak_weight = in_window.max() * async_download.REQUEST_WEIGHT / args.window_fraction
+    # The bucket may burst by its capacity on top of the steady rate.
+    allowed = args.weight_per_minute + async_download.REQUEST_WEIGHT * args.concurrency / args.window_fraction
+
+    print(f"Sequential:  {seq_seconds:.3f}s ({sync_exchange.calls} requests)")
+    print(f"Concurrent:  {conc_seconds:.3f}s ({exchange.calls} requests), {seq_seconds / conc_seconds:.1f}x")
+    print(f"Peak request weight, scaled to a minute: {peak_weight:,.0f} (allowed {allowed:,.0f})")
+
+    ok = all(seq[symbol].equals(conc[symbol]) for symbol in symbol_list)
+    print("Parity: concurrent downloads match sequential" if ok else "Parity check failed: downloads differ")
+    return ok and peak_weight <= allowed
+
+
+def bench_dataset(args):
+    df = synthetic_ohlcv(args.rows)
+    print(f"Rows: {len(df):,} | Window: {args.window_minutes:,} minutes | Tail: {args.tail:,} rows")
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset_dir = os.path.join(tmp, "ohlcv")
+        flat = dataset.flat_path("BTC/USDT", dataset_dir)
+        df.reset_index().to_parquet(flat)
+        dataset.migrate("BTC/USDT", dataset_dir)
+
+        start = df.index[len(df) // 2]
+        end = start + pd.Timedelta(minutes=args.window_minutes - 1)
+
+        def flat_window():
+            full = pd.read_parquet(flat).set_index("timestamp").sort_index()
+            return full.loc[start:end]
+
+        def flat_tail():
+            return pd.read_parquet(flat).set_index("timestamp").sort_index().tail(args.tail)
+
+        flat_range, flat_range_seconds = timed(flat_window)
+        window, window_seconds = timed(dataset.load_ohlcv, "BTC/USDT", start, end, dataset_dir=dataset_dir)
+        flat_last, flat_tail_seconds = timed(flat_tail)
+        tail, tail_seconds = timed(dataset.load_tail, "BTC/USDT", args.tail, dataset_dir=dataset_dir)
+        full = dataset.load_ohlcv("BTC/USDT", dataset_dir=dataset_dir)
+        empty = dataset.load_ohlcv("BTC/USDT", df.index[-1] + pd.Timedelta(days=1), dataset_dir=dataset_dir)
+
+    print(f"Window, flat file + slice: {flat_range_seconds * 1000:.1f} ms")
+    print(f"Window, dataset pushdown:  {window_seconds * 1000:.1f} ms, {flat_range_seconds / window_seconds:.1f}x")
+    print(f"Tail, flat file:           {flat_tail_seconds * 1000:.1f} ms")
+    print(f"Tail, last row groups:     {tail_seconds * 1000:.1f} ms, {flat_tail_seconds / tail_seconds:.1f}x")
+
+    for name, result, expected in (
+        ("window", window, flat_range),
+        ("tail", tail, flat_last),
+        ("full", full, df),
+    ):
+        if not result.equals(expected):
+            print(f"Parity check failed: dataset {name} differs from the flat file")
+            ok = False
+    if not empty.empty:
+        print("Parity check failed: a range after the data is not empty")
+        ok = False
+    if ok:
+        print("Parity: window, tail and full loads match the flat file")
+    return ok
+
+
+def bench_gaps(args):
+    df = synthetic_ohlcv(args.rows)
+    rng = np.random.default_rng(11)
+    starts = np.sort(rng.choice(np.arange(1, len(df) - 200), args.holes, replace=False))
+    lengths = rng.integers(1, 120, args.holes)
+    holes = np.zeros(len(df), dtype=bool)
+    for start, length in zip(starts, lengths):
+        holes[start:start + length] = True
+    # Every third hole is exchange downtime: the exchange does not have it either.
+    downtime = np.zeros(len(df), dtype=bool)
+    for start, length in zip(starts[::3], lengths[::3]):
+        downtime[start:start + length] = True
+    print(f"Rows: {len(df):,} | Holes: {args.holes} ({holes.sum():,} candles, {downtime.sum():,} unrecoverable)")
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        dataset.write_partitions(df[~holes].reset_index(), "BTC/USDT", tmp)
+        exchange = FakeExchange(df[~downtime])
+        (filled, remaining), seconds = timed(gaps.repair_gaps, "BTC/USDT", exchange, tmp)
+        first_calls = exchange.calls
+        gaps.repair_gaps("BTC/USDT", exchange, tmp)
+        repaired = dataset.load_ohlcv("BTC/USDT", dataset_dir=tmp)
+        index = gaps.load_gap_index("BTC/USDT", tmp)
+
+    print(f"Repair: {seconds:.3f}s, {first_calls} requests (full download: {-(-len(df) // download_data.limit)})")
+    print(f"Filled {filled:,} candles; {len(remaining)} gap(s), {gaps.gap_minutes(remaining):,} minutes left")
+    print(f"Rerun: {exchange.calls - first_calls} requests (recorded gaps skipped)")
+
+    expected = df[~downtime].copy()
+    expected.index = expected.index.as_unit("ms")
+    repaired.index = repaired.index.as_unit("ms")
+    if not repaired.equals(expected):
+        print("Parity check failed: repaired dataset differs from the exchange candles")
+        ok = False
+    if gaps.gap_minutes(index) != downtime.sum() or exchange.calls != first_calls:
+        print("Gap index check failed: unrecoverable holes are not recorded or were refetched")
+        ok = False
+
+    # Entries whose next MAX_HOLD minutes touch a hole must be masked, and only those.
+    labels = labeling.label_entries(repaired, repaired.index, args.tp)
+    missing = pd.DatetimeIndex(df.index[downtime]).as_unit("ms")
+    touches = np.zeros(len(repaired), dtype=bool)
+    for k in range(1, labeling.MAX_HOLD + 1):
+        ahead = repaired.index + pd.Timedelta(minutes=k)
+        touches |= ahead.isin(missing) & (ahead <= repaired.index[-1])
+    masked = labels.values == labeling.GAP_LABEL
+    print(f"Masked labels: {masked.sum():,} entries with a gap in their forward window")
+    if not np.array_equal(masked, touches):
+        print("Mask check failed: masked entries differ from windows touching a hole")
+        ok = False
+    if ok:
+        print("Parity: repaired dataset, gap index and label mask match")
+    return ok
+
+
+def synthetic_splits(rows, seed=42, tp=0.0023):
+    df = synthetic_ohlcv(rows, seed=seed)
+    X = features.build_features(df)
+    y = labeling.label_entries(df, X.index, tp)
+    return train_test_split.split_dataset(labeling.build_labeled(X, y), verbose=False)
+
+
+def bench_registry(args):
+    splits = synthetic_splits(args.rows)
+    print(f"Train rows: {len(splits['X_train']):,} | Registry budget: {args.max_entries} entries")
+
+    ok = True
+    with tempfile.TemporaryDirectory() as tmp:
+        registry = model_registry.ModelRegistry(tmp, max_entries=args.max_entries)
+        trained, fit_seconds = timed(train_xgboost.train_model, splits, verbose=False, registry=registry)
+        loaded, hit_seconds = timed(train_xgboost.train_model, splits, verbose=False, registry=registry)
+        key = model_registry.training_key(splits, train_xgboost.MODEL_PARAMS)
+
+        # Other splits fill the registry; the first key is evicted once it is the least recently used.
+        for seed in range(1, args.max_entries + 1):
+            train_xgboost.train_model(synthetic_splits(args.rows // 4, seed=seed), verbose=False, registry=registry)
+        remaining = [entry[0] for entry in registry.entries()]
+
+    print(f"\nFit and store:   {fit_seconds:.3f}s")
+    print(f"Registry lookup: {hit_seconds:.3f}s, {fit_seconds / hit_seconds:.1f}x")
+
+    X_test = splits["X_test"]
+    if not np.array_equal(trained.predict_proba(X_test), loaded.predict_proba(X_test)):
+        print("Parity check failed: registry model predicts differently")
+        ok = False
+    if len(remaining) != args.max_entries or key in remaining:
+        print("Eviction check failed: registry kept", len(remaining), "entries")
+        ok = False
+    if ok:
+        print(f"Parity: registry model matches; LRU eviction kept the {args.max_entries} newest entries")
+    return ok
+
+
+def bench_search(args):
+    splits = synthetic_splits(args.rows)
+    configs = tune_xgboost.search_configs(trials=args.trials)
+    print(f"Train rows: {len(splits['X_train']):,} | Trials: {len(configs)} | Concurrency: {args.concurrency}")
+
+    def per_trial_fits():
+        # One XGBClassifier per configuration, each building its matrices from the DataFrames.
+        losses = []
+        for config in configs:
+            params = {
+                **train_xgboost.MODEL_PARAMS,
+                **config,
+                "n_estimators": tune_xgboost.MAX_ROUNDS,
+                "early_stopping_rounds": tune_xgboost.EARLY_STOPPING_ROUNDS,
+                "max_bin": tune_xgboost.MAX_BIN,
+            }
+            model = xgb.XGBClassifier(**params)
+            model.fit(splits["X_train"], splits["y_train"], eval_set=[(splits["X_val"], splits["y_val"])], verbose=False)
+            losses.append(min(model.evals_result()["validation_0"]["logloss"]))
+        return losses
+
+    baseline, baseline_seconds = timed(per_trial_fits)
+    (leaderboard, model), search_seconds = timed(tune_xgboost.search, splits, configs, args.concurrency)
+
+    print(f"Per-trial fits from DataFrames: {baseline_seconds:.3f}s")
+    print(f"Shared quantized matrices:      {search_seconds:.3f}s, {baseline_seconds / search_seconds:.1f}x")
+    print(f"Best val logloss {leaderboard.loc[0, 'val_logloss']:.5f} after {leaderboard.loc[0, 'rounds']} rounds")
+
+    ok = True
+    search_losses = leaderboard.sort_values("trial")["val_logloss"].to_numpy()
+    if not np.allclose(search_losses, baseline, rtol=1e-4):
+        print("Parity check failed: search val logloss differs from per-trial fits")
+        ok = False
+    val_probs = model.predict_proba(splits["X_val"])[:, 1]
+    best_loss = log_loss(splits["y_val"], val_probs, labels=[0, 1])
+    if not np.isclose(best_loss, leaderboard.loc[0, "val_logloss"]):
+        print("Parity check failed: saved best model does not reproduce its leaderboard score")
+        ok = False
+    if ok:
+        print("Parity: trial scores match per-trial fits; best model reproduces its score")
+    return ok
+
+
+def bench_walk_forward(args):
+    splits = synthetic_splits(args.rows)
+    data = pd.concat([
+        splits[f"X_{part}"].assign(label=splits[f"y_{part}"]) for part in ("train", "val", "test")
+    ])
+    folds = walk_forward.walk_forward_folds(len(data), args.folds, window=args.window)
+    print(f"Rows: {len(data):,} | Folds: {args.folds} | Window: {args.window} | Fold rounds: {args.fold_rounds}")
+
+    X, y = data.drop(columns=["label"]), data["label"]
+    _, full_seconds = timed(walk_forward.fit_increment, X.iloc[:folds[0][1]], y.iloc[:folds[0][1]])
+
+    def refit_per_fold():
+        for _, test_start, _ in folds:
+            walk_forward.fit_increment(X.iloc[:test_start], y.iloc[:test_start])
+
+    _, refit_seconds = timed(refit_per_fold)
+    (probs, summary, _), warm_seconds = timed(
+        walk_forward.walk_forward, data, args.folds, window=args.window, fold_rounds=args.fold_rounds
+    )
+
+    print(f"One full fit:             {full_seconds:.3f}s")
+    print(f"Refit from scratch/fold:  {refit_seconds:.3f}s ({refit_seconds / full_seconds:.1f} full fits)")
+    print(f"Warm-started walk-forward: {warm_seconds:.3f}s ({warm_seconds / full_seconds:.1f} full fits)")
+
+    ok = True
+    expected = data.index[folds[0][1]:]
+    if not probs.index.equals(expected) or not probs["fold"].is_monotonic_increasing:
+        print("Coverage check failed: out-of-sample rows are missing, repeated or out of order")
+        ok = False
+    if (summary["train_start"] >= summary["test_start"]).any():
+        print("Lookahead check failed: a fold trains on rows at or after its test window")
+        ok = False
+    # A training row's label window (t, t + MAX_HOLD] must close before its fold's first test candle.
+    label_close = summary["train_end"] + pd.Timedelta(minutes=labeling.MAX_HOLD)
+    if (label_close >= summary["test_start"]).any():
+        print("Purge check failed: a training label window reaches its fold's test start")
+        ok = False
+    if ok:
+        print(f"Coverage: {len(probs):,} out-of-sample rows, each predicted once by a model trained before it")
+        print(f"Purged rows per fold: {summary['purged_rows'].mean():.0f}; no training label window crosses a test start")
+    return ok
+
+
+def bench_purged_cv(args):
+    splits = synthetic_splits(args.rows)
+    data = pd.concat([
+        splits[f"X_{part}"].assign(label=splits[f"y_{part}"]) for part in ("train", "val", "test")
+    ])
+    print(
+        f"Rows: {len(data):,} | Folds: {args.folds} | Workers: {args.workers} | "
+        f"Max hold: {labeling.MAX_HOLD}m | Embargo: {args.embargo_minutes}m"
+    )
+
+    (sequential, sequential_probs), sequential_seconds = timed(
+        purged_cv.purged_cv, data, args.folds, embargo=args.embargo_minutes, workers=1, n_jobs=1
+    )
+    (parallel, parallel_probs), parallel_seconds = timed(
+        purged_cv.purged_cv, data, args.folds, embargo=args.embargo_minutes, workers=args.workers, n_jobs=args.workers
+    )
+    print(f"\nSequential folds: {sequential_seconds:.3f}s")
+    print(f"Parallel folds:   {parallel_seconds:.3f}s, {sequential_seconds / parallel_seconds:.1f}x")
+
+    ok = True
+    # Brute-force leakage check: no training label window (t, t + MAX_HOLD] may reach the test
+    # fold's rows or label windows, and nothing in the embargo after them may be trained on.
+    minutes = data.index.as_unit("s").asi8 // 60
+    for start, end in purged_cv.fold_bounds(len(data), args.folds):
+        ranges, _, _ = purged_cv.purged_ranges(minutes, start, end, embargo=args.embargo_minutes)
+        train = np.concatenate([minutes[begin:stop] for begin, stop in ranges])
+        first, last = minutes[start], minutes[end - 1] + labeling.MAX_HOLD
+        if ((train + labeling.MAX_HOLD >= first) & (train <= last + args.embargo_minutes)).any():
+            print(f"Leakage check failed: fold starting {data.index[start]} trains on overlapping rows")
+            ok = False
+    metrics = ["train_rows", "purged_rows", "embargoed_rows", "test_logloss", "test_precision", "test_recall"]
+    if not sequential[metrics].equals(parallel[metrics]) or not sequential_probs.equals(parallel_probs):
+        print("Parity check failed: parallel folds differ from sequential folds")
+        ok = False
+    if not parallel_probs.index.equals(data.index):
+        print("Coverage check failed: out-of-fold rows are missing, repeated or out of order")
+        ok = False
+    if ok:
+        print(f"Purged rows per fold: {parallel['purged_rows'].mean():.0f} | Embargoed: {parallel['embargoed_rows'].mean():.0f}")
+        print(
+            f"Precision: {parallel['test_precision'].mean():.4f} ± {parallel['test_precision'].std():.4f} | "
+            f"Recall: {parallel['test_recall'].mean():.4f} ± {parallel['test_recall'].std():.4f}"
+        )
+        print("Leakage and parity checks passed")
+    return ok
+
+
+def _latencies(predict, rows):
+    seconds = []
+    for row in rows:
+        start = time.perf_counter()
+        predict(row)
+        seconds.append(time.perf_counter() - start)
+    return np.percentile(seconds, [50, 99]) * 1e6
+
+
+def bench_inference(args):
+    splits = synthetic_splits(args.rows)
+    model = xgb.XGBClassifier(**train_xgboost.MODEL_PARAMS, n_jobs=1)
+    model.fit(splits["X_train"], splits["y_train"], verbose=False)
+    columns = list(splits["X_test"].columns)
+    rows = splits["X_test"].to_numpy()[: args.predictions]
+    print(f"Single-row predictions: {len(rows):,} | Trees: {model.get_booster().num_boosted_rounds()}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model_path = os.path.join(tmp, "model.pkl")
+        train_xgboost.save_model(model, model_path)
+        predictor = inference.load_predictor(model_path)
+
+    # The previous live path: a one-row DataFrame through the sklearn wrapper.
+    def predict_proba(row):
+        return model.predict_proba(pd.DataFrame([row], columns=columns))[0, 1]
+
+    wrapper = _latencies(predict_proba, rows)
+    native = _latencies(predictor.predict, rows)
+    print(f"\n{'path':<22} {'p50 (us)':>10} {'p99 (us)':>10}")
+    print(f"{'predict_proba':<22} {wrapper[0]:>10.1f} {wrapper[1]:>10.1f}")
+    print(f"{'inference.Predictor':<22} {native[0]:>10.1f} {native[1]:>10.1f}")
+    print(f"Speedup: p50 {wrapper[0] / native[0]:.1f}x, p99 {wrapper[1] / native[1]:.1f}x")
+
+    expected = model.predict_proba(splits["X_test"].iloc[: args.predictions])[:, 1]
+    actual = np.array([predictor.predict(row) for row in rows])
+    max_err = np.abs(actual - expected).max()
+    print(f"Max probability difference: {max_err:.1e}")
+    return predictor.columns == columns and max_err < 1e-6
+
+
+def _pandas_true_range(df):
+    high_low = df["high"] - df["low"]
+    high_close = (df["high"] - df["close"].shift()).abs()
+    low_close = (df["low"] - df["close"].shift()).abs()
+    return pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+
+
+def _pandas_rsi(close, period):
+    delta = close.diff()
+    avg_gain = delta.clip(lower=0).rolling(period).mean()
+    avg_loss = (-delta.clip(upper=0)).rolling(period).mean()
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def bench_kernels(args):
+    df = synthetic_ohlcv(args.rows)
+    high, low, close, volume = (df[c].to_numpy() for c in ("high", "low", "close", "volume"))
+    log_ret = np.log(df["close"] / df["close"].shift(1))
+    print(f"Rows: {len(df):,}")
+
+    cases = [
+        (
+            "true range",
+            lambda: _pandas_true_range(df).to_numpy(),
+            lambda: kernels.true_range(high, low, close),
+        ),
+        (
+            "ATR 7/14",
+            lambda: [_pandas_true_range(df).rolling(w).mean().to_numpy() for w in (7, 14)],
+            lambda: list(kernels.atr(high, low, close, (7, 14)).values()),
+        ),
+        (
+            "RSI 5/9/14",
+            lambda: [_pandas_rsi(df["close"], w).to_numpy() for w in (5, 9, 14)],
+            lambda: list(kernels.rsi(close, (5, 9, 14)).values()),
+        ),
+        (
+            "log returns 1/3/5",
+            lambda: [np.log(df["close"] / df["close"].shift(k)).to_numpy() for k in (1, 3, 5)],
+            lambda: list(kernels.log_returns(close, (1, 3, 5)).values()),
+        ),
+        (
+            "return std 5/15",
+            lambda: [log_ret.rolling(w).std().to_numpy() for w in (5, 15)],
+            lambda: list(kernels.rolling_std(log_ret.to_numpy(), (5, 15)).values()),
+        ),
+        (
+            "volume mean+std 20",
+            lambda: [df["volume"].rolling(20).mean().to_numpy(), df["volume"].rolling(20).std().to_numpy()],
+            lambda: [a[20] for a in kernels.rolling_mean_std(volume, (20,))],
+        ),
+    ]
+
+    ok = True
+    print(f"{'Indicator':<20} {'pandas (s)':>11} {'kernel (s)':>11} {'speedup':>8} {'max rel err':>12}")
+    for name, reference, kernel in cases:
+        expected, pandas_seconds = timed(reference)
+        actual, kernel_seconds = timed(kernel)
+        expected, actual = np.atleast_2d(expected), np.atleast_2d(actual)
+
+        nan_match = np.array_equal(np.isnan(expected), np.isnan(actual))
+        scale = np.nanmax(np.abs(expected), axis=1, keepdims=True)
+        rel_err = np.nanmax(np.abs(actual - expected) / scale)
+        ok = ok and nan_match and rel_err < 1e-9
+
+        print(
+            f"{name:<20} {pandas_seconds:>11.3f} {kernel_seconds:>11.3f} "
+            f"{pandas_seconds / kernel_seconds:>7.1f}x {rel_err:>12.1e}"
+            + ("" if nan_match else "  NaN mismatch")
+        )
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipeline hot paths on synthetic candles.")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    labeling_parser = subparsers.add_parser("labeling", help="Vectorized vs legacy TP/SL labeling.")
+    labeling_parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic 1m candles to label.")
+    labeling_parser.add_argument("--legacy-rows", type=int, default=2_000, help="Rows timed with label_trade.")
+    labeling_parser.add_argument("--tp", type=float, default=0.0023, help="Take-profit percentage.")
+    labeling_parser.set_defaults(func=bench_labeling)
+
+    exits_parser = subparsers.add_parser("exits", help="Array exit resolver vs per-signal slice scan.")
+    exits_parser.add_argument("--rows", type=int, default=500_000, help="Synthetic 1m candles.")
+    exits_parser.add_argument("--signal-rate", type=float, default=0.5, help="Fraction of candles with an entry signal.")
+    exits_parser.add_argument("--legacy-signals", type=int, default=2_000, help="Signals timed with the legacy scan.")
+    exits_parser.add_argument("--tp", type=float, default=0.0023, help="Take-profit percentage.")
+    exits_parser.set_defaults(func=bench_exits)
+
+    stream_parser = subparsers.add_parser("features-stream", help="Streaming vs batch feature engine.")
+    stream_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    stream_parser.add_argument("--lookback", type=int, default=200, help="Candles recomputed per live tick.")
+    stream_parser.add_argument(
+        "--timeframes",
+        type=features.parse_timeframes,
+        default=[],
+        help="Higher timeframes to include, e.g. 5m,15m,1h.",
+    )
+    stream_parser.set_defaults(func=bench_features_stream)
+
+    kernels_parser = subparsers.add_parser("kernels", help="NumPy indicator kernels vs pandas, per indicator.")
+    kernels_parser.add_argument("--rows", type=int, default=10_000_000, help="Synthetic 1m candles.")
+    kernels_parser.set_defaults(func=bench_kernels)
+
+    download_parser = subparsers.add_parser(
+        "download", help="Incremental and resumed downloads against a local fake exchange."
+    )
+    download_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    download_parser.add_argument(
+        "--flush-every", type=int, default=20_000, help="Candles per checkpointed part file."
+    )
+    download_parser.set_defaults(func=bench_download)
+
+    async_parser = subparsers.add_parser(
+        "download-async", help="Concurrent vs sequential download against a fake exchange with latency."
+    )
+    async_parser.add_argument("--symbols", type=int, default=4, help="Synthetic symbols.")
+    async_parser.add_argument("--rows", type=int, default=60_000, help="Synthetic 1m candles per symbol.")
+    async_parser.add_argument("--months", type=int, default=1, help="History downloaded per symbol.")
+    async_parser.add_argument("--latency", type=float, default=0.05, help="Simulated seconds per request.")
+    async_parser.add_argument("--concurrency", type=int, default=8, help="Chunks downloaded at the same time.")
+    async_parser.add_argument(
+        "--weight-per-minute", type=float, default=60_000, help="Token bucket budget for the run."
+    )
+    async_parser.add_argument(
+        "--chunk-minutes", type=int, default=async_download.CHUNK_MINUTES // 5, help="Minutes per chunk."
+    )
+    async_parser.add_argument(
+        "--window-fraction", type=float, default=0.05, help="Fraction of a minute used to measure peak weight."
+    )
+    async_parser.set_defaults(func=bench_download_async)
+
+    dataset_parser = subparsers.add_parser(
+        "dataset", help="Partitioned dataset range and tail loads vs reading the flat file."
+    )
+    dataset_parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic 1m candles.")
+    dataset_parser.add_argument("--window-minutes", type=int, default=360, help="Minutes in the range load.")
+    dataset_parser.add_argument("--tail", type=int, default=500, help="Rows in the tail load.")
+    dataset_parser.set_defaults(func=bench_dataset)
+
+    gaps_parser = subparsers.add_parser("gaps", help="Gap repair against a fake exchange with downtime holes.")
+    gaps_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    gaps_parser.add_argument("--holes", type=int, default=30, help="Missing ranges cut from the stored data.")
+    gaps_parser.add_argument("--tp", type=float, default=0.0023, help="Take-profit percentage for the mask check.")
+    gaps_parser.set_defaults(func=bench_gaps)
+
+    registry_parser = subparsers.add_parser("registry", help="Model registry lookup vs refit, and LRU eviction.")
+    registry_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    registry_parser.add_argument("--max-entries", type=int, default=3, help="Registry entry budget.")
+    registry_parser.set_defaults(func=bench_registry)
+
+    search_parser = subparsers.add_parser(
+        "search", help="Hyperparameter search on shared quantized matrices vs per-trial fits."
+    )
+    search_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    search_parser.add_argument("--trials", type=int, default=6, help="Configurations sampled from SEARCH_SPACE.")
+    search_parser.add_argument(
+        "--concurrency", type=int, default=min(4, os.cpu_count() or 1), help="Trials trained at the same time."
+    )
+    search_parser.set_defaults(func=bench_search)
+
+    walk_parser = subparsers.add_parser(
+        "walk-forward", help="Warm-started walk-forward vs one full fit and per-fold refits."
+    )
+    walk_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    walk_parser.add_argument("--folds", type=int, default=5, help="Out-of-sample test windows.")
+    walk_parser.add_argument("--window", choices=walk_forward.WINDOWS, default="expanding", help="Training window.")
+    walk_parser.add_argument(
+        "--fold-rounds", type=int, default=walk_forward.FOLD_ROUNDS, help="Trees added per fold."
+    )
+    walk_parser.set_defaults(func=bench_walk_forward)
+
+    cv_parser = subparsers.add_parser(
+        "purged-cv", help="Purged k-fold CV: leakage check and parallel vs sequential folds."
+    )
+    cv_parser.add_argument("--rows", type=int, default=200_000, help="Synthetic 1m candles.")
+    cv_parser.add_argument("--folds", type=int, default=5, help="Consecutive test folds.")
+    cv_parser.add_argument(
+        "--workers", type=int, default=2, help="Fold worker processes."
+    )
+    cv_parser.add_argument(
+        "--embargo-minutes", type=int, default=purged_cv.EMBARGO_MINUTES, help="Embargo after each purge window."
+    )
+    cv_parser.set_defaults(func=bench_purged_cv)
+
+    inference_parser = subparsers.add_parser(
+        "inference", help="Native single-row predictor vs predict_proba on a one-row DataFrame, p50/p99 latency."
+    )
+    inference_parser.add_argument("--rows", type=int, default=100_000, help="Synthetic 1m candles.")
+    inference_parser.add_argument("--predictions", type=int, default=5_000, help="Single-row predictions timed.")
+    inference_parser.set_defaults(func=bench_inference)
+
+    args = parser.parse_args()
+    ok = args.func(args)
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    main()
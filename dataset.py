@@ -0,0 +1,209 @@
+import argparse
+import glob
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+import symbols
+
+DATASET_DIR = "data/raw/ohlcv"
+
+# One day of 1m candles per row group: range reads skip whole days by their min/max statistics.
+ROW_GROUP_SIZE = 1440
+
+OHLCV_COLUMNS = ["open", "high", "low", "close", "volume"]
+
+
+def partition_dir(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    return os.path.join(dataset_dir, f"symbol={symbols.symbol_slug(symbol)}")
+
+
+def partition_path(symbol, month, dataset_dir=DATASET_DIR):
+    return os.path.join(partition_dir(symbol, dataset_dir), f"month={month}", "data.parquet")
+
+
+def flat_path(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Pre-dataset single-file location, next to the dataset root (data/raw/<symbol>_1m.parquet)."""
+    return os.path.join(os.path.dirname(dataset_dir), f"{symbols.symbol_slug(symbol)}_1m.parquet")
+
+
+def _utc(ts):
+    ts = pd.Timestamp(ts)
+    return ts.tz_localize("UTC") if ts.tzinfo is None else ts.tz_convert("UTC")
+
+
+def _month(ts):
+    return _utc(ts).strftime("%Y-%m")
+
+
+def partition_files(symbol=symbols.DEFAULT_SYMBOL, start=None, end=None, dataset_dir=DATASET_DIR):
+    """Month files of ``symbol`` overlapping [start, end], in time order."""
+    files = sorted(glob.glob(os.path.join(partition_dir(symbol, dataset_dir), "month=*", "data.parquet")))
+    low = _month(start) if start is not None else None
+    high = _month(end) if end is not None else None
+    selected = []
+    for path in files:
+        month = os.path.basename(os.path.dirname(path)).split("=", 1)[1]
+        if (low is None or month >= low) and (high is None or month <= high):
+            selected.append(path)
+    return selected
+
+
+def has_dataset(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    return bool(partition_files(symbol, dataset_dir=dataset_dir))
+
+
+def raw_files(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Files holding the raw candles of ``symbol`` (partitions, else the flat file), for fingerprints."""
+    return partition_files(symbol, dataset_dir=dataset_dir) or [flat_path(symbol, dataset_dir)]
+
+
+def _to_frame(table):
+    df = table.to_pandas()
+    return df.set_index("timestamp")
+
+
+def load_ohlcv(symbol=symbols.DEFAULT_SYMBOL, start=None, end=None, columns=None, dataset_dir=DATASET_DIR):
+    """Candles of ``symbol`` with start <= timestamp <= end, indexed by timestamp.
+
+    Only month partitions overlapping the range are opened, and row groups
+    outside it are skipped by their statistics. Falls back to the flat
+    file when no dataset exists yet.
+    """
+    filters = []
+    if start is not None:
+        filters.append(("timestamp", ">=", _utc(start)))
+    if end is not None:
+        filters.append(("timestamp", "<=", _utc(end)))
+    read_columns = ["timestamp", *(columns or OHLCV_COLUMNS)]
+
+    if not has_dataset(symbol, dataset_dir):
+        df = pd.read_parquet(flat_path(symbol, dataset_dir), columns=read_columns, filters=filters or None)
+        return df.set_index("timestamp").sort_index()
+
+    # With no overlapping month, any partition read through the filters gives a typed empty frame.
+    files = partition_files(symbol, start, end, dataset_dir)
+    files = files or partition_files(symbol, dataset_dir=dataset_dir)[:1]
+    # Partitions are written sorted and read in month order, so no sort is needed.
+    return _to_frame(pq.read_table(files, columns=read_columns, filters=filters or None))
+
+
+def load_tail(symbol=symbols.DEFAULT_SYMBOL, rows=500, columns=None, dataset_dir=DATASET_DIR):
+    """Last ``rows`` candles, reading only the trailing row groups."""
+    if not has_dataset(symbol, dataset_dir):
+        return load_ohlcv(symbol, columns=columns, dataset_dir=dataset_dir).tail(rows)
+
+    read_columns = ["timestamp", *(columns or OHLCV_COLUMNS)]
+    tables, needed = [], rows
+    for path in reversed(partition_files(symbol, dataset_dir=dataset_dir)):
+        parquet_file = pq.ParquetFile(path)
+        for group in reversed(range(parquet_file.num_row_groups)):
+            tables.append(parquet_file.read_row_group(group, columns=read_columns))
+            needed -= tables[-1].num_rows
+            if needed <= 0:
+                break
+        if needed <= 0:
+            break
+    return _to_frame(pa.concat_tables(reversed(tables))).tail(rows)
+
+
+def timestamp_bounds(path):
+    """(rows, first, last) of a parquet file with a timestamp column from its footer, without reading data."""
+    metadata = pq.ParquetFile(path).metadata
+    column = metadata.schema.names.index("timestamp")
+    stats = [metadata.row_group(group).column(column).statistics for group in range(metadata.num_row_groups)]
+    if not stats:
+        return 0, None, None
+    return metadata.num_rows, pd.Timestamp(min(s.min for s in stats)), pd.Timestamp(max(s.max for s in stats))
+
+
+def last_timestamp(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Newest stored candle time from the last partition's statistics, or None."""
+    files = partition_files(symbol, dataset_dir=dataset_dir)
+    return timestamp_bounds(files[-1])[2] if files else None
+
+
+def summary(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Row count and first/last candle time of ``symbol`` from partition footers only."""
+    bounds = [timestamp_bounds(path) for path in partition_files(symbol, dataset_dir=dataset_dir)]
+    bounds = [b for b in bounds if b[0]]
+    if not bounds:
+        return {"rows": 0, "start": None, "end": None}
+    return {"rows": sum(b[0] for b in bounds), "start": bounds[0][1], "end": bounds[-1][2]}
+
+
+def write_partitions(df, symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Merge candles (with a ``timestamp`` column) into their month partitions.
+
+    Only the months present in ``df`` are rewritten. Rows are deduplicated
+    by timestamp, newest write winning, and each file is sorted and written
+    with ROW_GROUP_SIZE row groups. Returns the months written.
+    """
+    months = df["timestamp"].dt.year * 100 + df["timestamp"].dt.month
+    written = []
+    for key, rows in df.groupby(months.to_numpy(), sort=True):
+        month = f"{key // 100:04d}-{key % 100:02d}"
+        path = partition_path(symbol, month, dataset_dir)
+        if os.path.exists(path):
+            rows = pd.concat([pd.read_parquet(path), rows], ignore_index=True)
+
+        rows = rows.drop_duplicates(subset="timestamp", keep="last").sort_values("timestamp")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        table = pa.Table.from_pandas(rows[["timestamp", *OHLCV_COLUMNS]], preserve_index=False)
+        pq.write_table(table, path + ".tmp", row_group_size=ROW_GROUP_SIZE)
+        os.replace(path + ".tmp", path)
+        written.append(month)
+    return written
+
+
+def write_batches(frames, symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR):
+    """Merge an iterable of candle frames into month partitions, one month at a time.
+
+    Frames should arrive in time order. A month is deduplicated, sorted and
+    written (through write_partitions) as soon as a frame from another month
+    arrives, so peak memory is one month plus one frame whatever the range.
+    Out-of-order frames are still correct; their month is merged again.
+    Returns the months written.
+    """
+    pending, pending_month, written = [], None, []
+    for df in frames:
+        months = df["timestamp"].dt.year * 100 + df["timestamp"].dt.month
+        for key, rows in df.groupby(months.to_numpy(), sort=True):
+            if pending and key != pending_month:
+                written += write_partitions(pd.concat(pending, ignore_index=True), symbol, dataset_dir)
+                pending = []
+            pending_month = key
+            pending.append(rows)
+    if pending:
+        written += write_partitions(pd.concat(pending, ignore_index=True), symbol, dataset_dir)
+    return written
+
+
+def migrate(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=DATASET_DIR, batch_size=ROW_GROUP_SIZE * 31):
+    """Partition the flat raw file of ``symbol`` into the dataset, streaming it in batches."""
+    batches = pq.ParquetFile(flat_path(symbol, dataset_dir)).iter_batches(batch_size=batch_size)
+    return write_batches((batch.to_pandas() for batch in batches), symbol, dataset_dir)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert flat raw candle files into the symbol/month partitioned dataset."
+    )
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols whose data/raw/<symbol>_1m.parquet files are converted.",
+    )
+    parser.add_argument("--dataset-dir", default=DATASET_DIR, help="Root of the partitioned dataset.")
+    args = parser.parse_args()
+
+    for symbol in args.symbols:
+        months = migrate(symbol, args.dataset_dir)
+        print(f"{symbol}: wrote {len(months)} month partition(s) under {partition_dir(symbol, args.dataset_dir)}")
+
+
+if __name__ == "__main__":
+    main()
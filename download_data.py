@@ -1,32 +1,159 @@
+import argparse
 import ccxt
+import json
 import pandas as pd
+import shutil
 import time
 import os
 from tqdm import tqdm
 
-exchange = ccxt.binance({
-    "enableRateLimit": True,
-    "options": {
-        "defaultType": "future"
-    }
-})
+import dataset
+import symbols
+
+COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
 
-symbol = "BTC/USDT"
 timeframe = "1m"
 
 months_of_data = 6
 
-def main():
-    since_timestamp = exchange.parse8601(
-        (pd.Timestamp.utcnow() - pd.DateOffset(months=months_of_data))
-        .strftime("%Y-%m-%d %H:%M:%S")
-    )
+limit = 1500  # max Binance allows per request
+
+# Fetched candles are written to a part file and checkpointed every this many candles.
+FLUSH_EVERY = 50_000
 
-    limit = 1500  # max Binance allows per request
-    all_candles = []
-    current_since = since_timestamp
 
-    with tqdm(desc="Downloading BTCUSDT 1m data") as progress:
+def make_exchange():
+    return ccxt.binance({
+        "enableRateLimit": True,
+        "options": {
+            "defaultType": "future"
+        }
+    })
+
+
+def candles_to_frame(candles):
+    # Explicit dtypes keep empty pages from turning merged columns into object.
+    df = pd.DataFrame(candles, columns=COLUMNS).astype({column: "float64" for column in COLUMNS[1:]})
+    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
+    return df
+
+
+def last_stored_ms(symbol, dataset_dir=dataset.DATASET_DIR):
+    """Open time (ms) of the newest stored candle of ``symbol``, or None."""
+    last = dataset.last_timestamp(symbol, dataset_dir)
+    return None if last is None else int(last.timestamp() * 1000)
+
+
+def partial_dir(symbol, dataset_dir=dataset.DATASET_DIR):
+    # Underscore-prefixed, so it is never picked up as a month partition.
+    return os.path.join(dataset.partition_dir(symbol, dataset_dir), "_partial")
+
+
+def load_checkpoint(partial):
+    path = os.path.join(partial, "checkpoint.json")
+    if not os.path.exists(path):
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_checkpoint(partial, checkpoint):
+    # Write-then-rename so an interruption never leaves a truncated checkpoint.
+    path = os.path.join(partial, "checkpoint.json")
+    with open(path + ".tmp", "w") as f:
+        json.dump(checkpoint, f)
+    os.replace(path + ".tmp", path)
+
+
+def flush_part(partial, checkpoint, candles, next_since):
+    """Persist fetched candles as the next part file and advance the checkpoint."""
+    if candles:
+        name = f"part-{len(checkpoint['parts']):05d}.parquet"
+        candles_to_frame(candles).to_parquet(os.path.join(partial, name))
+        checkpoint["parts"].append(name)
+    checkpoint["next_since"] = next_since
+    save_checkpoint(partial, checkpoint)
+
+
+def merge_parts(symbol, parts, dataset_dir=dataset.DATASET_DIR):
+    """Merge downloaded part files into the month partitions they touch, then drop them.
+
+    Parts are read one at a time and merged a month at a time, so memory
+    does not grow with the downloaded range.
+    """
+    partial = partial_dir(symbol, dataset_dir)
+    # Parts are in fetch order, so later fetches win: the last stored
+    # candle may have still been forming when it was first downloaded.
+    frames = (pd.read_parquet(os.path.join(partial, name)) for name in parts)
+    dataset.write_batches(frames, symbol, dataset_dir)
+    shutil.rmtree(partial)
+
+
+def report_missing(symbol, dataset_dir=dataset.DATASET_DIR):
+    """Print and return the stored row count, time range and missing minutes.
+
+    Read from the partition footers; partitions hold unique timestamps, so
+    every minute of the range not accounted for by a row is missing.
+    """
+    stored = dataset.summary(symbol, dataset_dir)
+    if not stored["rows"]:
+        print(f"No candles stored for {symbol}")
+        return {**stored, "missing": 0}
+
+    expected = int((stored["end"] - stored["start"]) / pd.Timedelta(minutes=1)) + 1
+    stored["missing"] = expected - stored["rows"]
+
+    print("Total candles:", stored["rows"])
+    print("Missing candles:", stored["missing"])
+    if stored["missing"]:
+        print(f"Refetch them with: python gaps.py --symbols {symbol}")
+    print("Saved to:", dataset.partition_dir(symbol, dataset_dir))
+    return stored
+
+
+def download_symbol(
+    symbol,
+    exchange=None,
+    dataset_dir=dataset.DATASET_DIR,
+    months=months_of_data,
+    flush_every=FLUSH_EVERY,
+    show_progress=True,
+):
+    """Fetch candles newer than the stored dataset for ``symbol`` and append them.
+
+    Starts ``months`` back when nothing is stored. A flat
+    ``data/raw/<symbol>_1m.parquet`` from older versions is partitioned
+    first. Progress is checkpointed under the symbol's ``_partial/``
+    directory so an interrupted download resumes from the last flushed part.
+    ``exchange`` can be any object with ``fetch_ohlcv``, ``milliseconds``
+    and ``rateLimit``. Memory is bounded by ``flush_every`` candles and one
+    month of merged data. Returns the report_missing summary.
+    """
+    exchange = exchange or make_exchange()
+    partial = partial_dir(symbol, dataset_dir)
+
+    if not dataset.has_dataset(symbol, dataset_dir) and os.path.exists(dataset.flat_path(symbol, dataset_dir)):
+        print(f"Partitioning {dataset.flat_path(symbol, dataset_dir)} into {dataset.partition_dir(symbol, dataset_dir)}")
+        dataset.migrate(symbol, dataset_dir)
+
+    checkpoint = load_checkpoint(partial)
+    if checkpoint is not None:
+        print(f"Resuming {symbol} download from checkpoint ({len(checkpoint['parts'])} part(s) saved)")
+    else:
+        start = last_stored_ms(symbol, dataset_dir)
+        if start is None:
+            now = pd.Timestamp(exchange.milliseconds(), unit="ms", tz="UTC")
+            start = int((now - pd.DateOffset(months=months)).timestamp() * 1000)
+        else:
+            print(f"{symbol}: appending candles from {pd.Timestamp(start, unit='ms', tz='UTC')}")
+        os.makedirs(partial, exist_ok=True)
+        checkpoint = {"symbol": symbol, "next_since": start, "parts": []}
+        save_checkpoint(partial, checkpoint)
+
+    buffer = []
+    current_since = checkpoint["next_since"]
+
+    with tqdm(desc=f"Downloading {symbol} 1m data", disable=not show_progress) as progress:
         while True:
             candles = exchange.fetch_ohlcv(
                 symbol=symbol,
@@ -38,42 +165,46 @@ def main():
             if not candles:
                 break
 
-            all_candles.extend(candles)
+            buffer.extend(candles)
 
             current_since = candles[-1][0] + 60_000
             progress.update(len(candles))
 
+            if len(buffer) >= flush_every:
+                flush_part(partial, checkpoint, buffer, current_since)
+                buffer = []
+
             if current_since >= exchange.milliseconds():
                 break
 
             time.sleep(exchange.rateLimit / 1000)
 
-    df = pd.DataFrame(
-        all_candles,
-        columns=["timestamp", "open", "high", "low", "close", "volume"]
-    )
+    flush_part(partial, checkpoint, buffer, current_since)
+    merge_parts(symbol, checkpoint["parts"], dataset_dir)
+    return report_missing(symbol, dataset_dir)
 
-    df["timestamp"] = pd.to_datetime(df["timestamp"], unit="ms", utc=True)
-    df = df.drop_duplicates(subset="timestamp")
-    df = df.sort_values("timestamp")
-    df = df.reset_index(drop=True)
-
-    expected_times = pd.date_range(
-        start=df["timestamp"].iloc[0],
-        end=df["timestamp"].iloc[-1],
-        freq="1min",
-        tz="UTC"
-    )
-    missing = expected_times.difference(df["timestamp"])
 
-    print("Total candles:", len(df))
-    print("Missing candles:", len(missing))
+def main():
+    parser = argparse.ArgumentParser(description="Download 1m OHLCV candles from Binance futures.")
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols, e.g. BTC/USDT,ETH/USDT. Each is saved to its own raw file.",
+    )
+    parser.add_argument(
+        "--months",
+        type=int,
+        default=months_of_data,
+        help="History to fetch for a symbol without a stored file.",
+    )
+    args = parser.parse_args()
 
-    os.makedirs("data/raw", exist_ok=True)
-    output_path = "data/raw/btcusdt_1m.parquet"
-    df.to_parquet(output_path, engine="pyarrow")
+    exchange = make_exchange()
 
-    print("Saved file to:", output_path)
+    # Sequential on purpose: every symbol shares the exchange rate limit.
+    for symbol in args.symbols:
+        download_symbol(symbol, exchange, months=args.months)
 
 
 if __name__ == "__main__":
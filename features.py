@@ -1,79 +1,515 @@
+from collections import deque
+import argparse
+import glob
+import hashlib
+import math
+import os
+import shutil
+
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
 
-def compute_rsi(series, period):
-    delta = series.diff()
-    gain = delta.clip(lower=0)
-    loss = -delta.clip(upper=0)
+import dataset
+import kernels
+import symbols
+from storage import DEFAULT_PRECISION, PRECISIONS, apply_precision, report_memory
 
-    avg_gain = gain.rolling(period).mean()
-    avg_loss = loss.rolling(period).mean()
+FEATURES_PATH = symbols.features_path(symbols.DEFAULT_SYMBOL)
+MANIFEST_PATH = "data/features/manifest.json"
 
-    rs = avg_gain / avg_loss
-    rsi = 100 - (100 / (1 + rs))
-    return rsi
+# Raw candles reloaded before the last stored row in --append mode. Covers the
+# 20-bar volume window, and the EMA(21) seed weight decays to (20/22)**600 ~ 1e-25.
+WARMUP_BARS = 600
 
+FEATURE_COLUMNS = [
+    "log_ret_1", "log_ret_3", "log_ret_5",
+    "candle_body", "candle_range",
+    "rsi_5", "rsi_9", "rsi_14",
+    "ema9_dist", "ema21_dist",
+    "atr_7", "atr_14",
+    "ret_std_5", "ret_std_15",
+    "vol_zscore", "vol_spike"
+]
+
+# Optional higher-timeframe context, resampled from the 1m candles.
+HTF_MINUTES = {"5m": 5, "15m": 15, "1h": 60}
+HTF_WINDOW = 14
+
+
+def htf_columns(timeframe):
+    return [f"log_ret_{timeframe}", f"atr_{HTF_WINDOW}_{timeframe}", f"rsi_{HTF_WINDOW}_{timeframe}"]
+
+
+def feature_columns(timeframes=()):
+    return FEATURE_COLUMNS + [column for tf in timeframes for column in htf_columns(tf)]
+
+
+def stored_timeframes(columns):
+    """Higher timeframes present in an existing feature file's columns."""
+    return [tf for tf in HTF_MINUTES if htf_columns(tf)[0] in columns]
+
+
+def htf_warmup_bars(timeframes=()):
+    """1m candles needed before the slowest higher-timeframe indicator is valid.
+
+    Covers HTF_WINDOW + 1 completed bars plus a partial first bar.
+    """
+    longest = max((HTF_MINUTES[tf] for tf in timeframes), default=0)
+    return (HTF_WINDOW + 2) * longest
+
+
+def parse_timeframes(value):
+    timeframes = [tf.strip() for tf in value.split(",") if tf.strip()]
+    unknown = [tf for tf in timeframes if tf not in HTF_MINUTES]
+    if unknown:
+        raise argparse.ArgumentTypeError(
+            f"unknown timeframe(s) {', '.join(unknown)}; choose from {', '.join(HTF_MINUTES)}"
+        )
+    return timeframes
+
+
+def _rsi(avg_gain, avg_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rs = np.float64(avg_gain) / np.float64(avg_loss)
+    return float(100 - (100 / (1 + rs)))
+
+
+def resample_ohlc(df, minutes):
+    """Epoch-aligned OHLC bars of ``minutes`` width, indexed by bar open time; empty bins dropped."""
+    bars = df[["open", "high", "low", "close"]].resample(
+        f"{minutes}min", origin="epoch", label="left", closed="left"
+    )
+    return bars.agg({"open": "first", "high": "max", "low": "min", "close": "last"}).dropna()
+
+
+def build_htf_features(df, timeframe):
+    """Higher-timeframe returns, ATR and RSI aligned to the 1m index without lookahead.
+
+    A bar covering [T, T + m) is only complete once its last minute has
+    closed, so it is stamped T + m - 1min and forward-filled onto the 1m rows
+    from there. Each 1m row therefore sees the latest completed bar only.
+    """
+    minutes = HTF_MINUTES[timeframe]
+    bars = resample_ohlc(df, minutes)
+    high = bars["high"].to_numpy(dtype=np.float64)
+    low = bars["low"].to_numpy(dtype=np.float64)
+    close = bars["close"].to_numpy(dtype=np.float64)
+
+    ret_col, atr_col, rsi_col = htf_columns(timeframe)
+    htf = pd.DataFrame({
+        ret_col: kernels.log_returns(close, (1,))[1],
+        atr_col: kernels.atr(high, low, close, (HTF_WINDOW,))[HTF_WINDOW],
+        rsi_col: kernels.rsi(close, (HTF_WINDOW,))[HTF_WINDOW],
+    }, index=bars.index + pd.Timedelta(minutes=minutes - 1))
+
+    return htf.reindex(df.index, method="ffill")
+
+
+def build_features(df, timeframes=()):
+    """Feature matrix for an OHLCV frame indexed by timestamp (NaN warm-up rows dropped).
+
+    ``timeframes`` (keys of HTF_MINUTES) appends higher-timeframe columns.
+    """
+    open_ = df["open"].to_numpy(dtype=np.float64)
+    high = df["high"].to_numpy(dtype=np.float64)
+    low = df["low"].to_numpy(dtype=np.float64)
+    close = df["close"].to_numpy(dtype=np.float64)
+    volume = df["volume"].to_numpy(dtype=np.float64)
+
+    log_ret = kernels.log_returns(close, (1, 3, 5))
+    rsi = kernels.rsi(close, (5, 9, 14))
+    atr = kernels.atr(high, low, close, (7, 14))
+    ret_std = kernels.rolling_std(log_ret[1], (5, 15))
+
+    vol_mean, vol_std = (stat[20] for stat in kernels.rolling_mean_std(volume, (20,)))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vol_zscore = (volume - vol_mean) / vol_std
+
+    ema_9 = df["close"].ewm(span=9, adjust=False).mean().to_numpy()
+    ema_21 = df["close"].ewm(span=21, adjust=False).mean().to_numpy()
+
+    X = pd.DataFrame({
+        "log_ret_1": log_ret[1],
+        "log_ret_3": log_ret[3],
+        "log_ret_5": log_ret[5],
+        "candle_body": close - open_,
+        "candle_range": high - low,
+        "rsi_5": rsi[5],
+        "rsi_9": rsi[9],
+        "rsi_14": rsi[14],
+        "ema9_dist": close - ema_9,
+        "ema21_dist": close - ema_21,
+        "atr_7": atr[7],
+        "atr_14": atr[14],
+        "ret_std_5": ret_std[5],
+        "ret_std_15": ret_std[15],
+        "vol_zscore": vol_zscore,
+        "vol_spike": (vol_zscore > 2).astype(np.int8),
+    }, index=df.index)
+
+    for timeframe in timeframes:
+        X = X.join(build_htf_features(df, timeframe))
+
+    return X.dropna()
+
+
+class RollingWindow:
+    """Fixed-size window with O(1) running sum and sum of squares.
+
+    Values are pushed one at a time; mean/std are NaN until the window is
+    full, matching ``Series.rolling(size)``. Sums are recomputed from the
+    buffer every ``resync`` pushes to bound floating-point drift.
+    """
+
+    def __init__(self, size, resync=1024):
+        self.size = size
+        self.values = deque(maxlen=size)
+        self.total = 0.0
+        self.total_sq = 0.0
+        self.resync = resync
+        self._pushes = 0
+
+    def push(self, value):
+        if len(self.values) == self.size:
+            old = self.values[0]
+            self.total -= old
+            self.total_sq -= old * old
+        self.values.append(value)
+        self.total += value
+        self.total_sq += value * value
+
+        self._pushes += 1
+        if self._pushes % self.resync == 0:
+            self.total = math.fsum(self.values)
+            self.total_sq = math.fsum(v * v for v in self.values)
+
+    @property
+    def full(self):
+        return len(self.values) == self.size
+
+    def mean(self):
+        return self.total / self.size if self.full else math.nan
+
+    def std(self):
+        if not self.full:
+            return math.nan
+        mean = self.total / self.size
+        var = (self.total_sq - self.total * mean) / (self.size - 1)
+        return math.sqrt(max(var, 0.0))
 
-def main():
-    df = pd.read_parquet("data/raw/btcusdt_1m.parquet")
 
-    # Set timestamp as index
-    df = df.set_index("timestamp")
-    df = df.sort_index()
+class HigherTimeframeBars:
+    """Streaming aggregation of closed 1m candles into one higher timeframe.
 
-    df["log_ret_1"] = np.log(df["close"] / df["close"].shift(1))
-    df["log_ret_3"] = np.log(df["close"] / df["close"].shift(3))
-    df["log_ret_5"] = np.log(df["close"] / df["close"].shift(5))
+    Keeps only the forming bar and the indicator state of completed bars, so
+    each 1m update is O(1) regardless of the timeframe. Bars are aligned to
+    the epoch like ``resample_ohlc`` and values change only when a bar
+    completes, matching ``build_htf_features``.
+    """
 
-    df["candle_body"] = df["close"] - df["open"]
-    df["candle_range"] = df["high"] - df["low"]
+    def __init__(self, minutes):
+        self.minutes = minutes
+        self.bucket = None
+        self.bar = None
+        self.prev_close = math.nan
+        self.true_range = RollingWindow(HTF_WINDOW)
+        self.gain = RollingWindow(HTF_WINDOW)
+        self.loss = RollingWindow(HTF_WINDOW)
+        self.values = [math.nan, math.nan, math.nan]
 
-    df["rsi_5"] = compute_rsi(df["close"], 5)
-    df["rsi_9"] = compute_rsi(df["close"], 9)
-    df["rsi_14"] = compute_rsi(df["close"], 14)
+    def _complete_bar(self):
+        high, low, close = self.bar
+        self.bar = None
 
-    df["ema_9"] = df["close"].ewm(span=9, adjust=False).mean()
-    df["ema_21"] = df["close"].ewm(span=21, adjust=False).mean()
+        ranges = [high - low]
+        log_ret = math.nan
+        if not math.isnan(self.prev_close):
+            ranges += [abs(high - self.prev_close), abs(low - self.prev_close)]
+            log_ret = math.log(close / self.prev_close)
+            delta = close - self.prev_close
+            self.gain.push(max(delta, 0.0))
+            self.loss.push(-min(delta, 0.0))
+        self.true_range.push(max(ranges))
+        self.prev_close = close
 
-    df["ema9_dist"] = df["close"] - df["ema_9"]
-    df["ema21_dist"] = df["close"] - df["ema_21"]
+        self.values = [log_ret, self.true_range.mean(), _rsi(self.gain.mean(), self.loss.mean())]
 
-    high_low = df["high"] - df["low"]
-    high_close = (df["high"] - df["close"].shift()).abs()
-    low_close = (df["low"] - df["close"].shift()).abs()
+    def update(self, timestamp, high, low, close):
+        """Add the 1m candle opening at ``timestamp``; returns the latest completed-bar values."""
+        minute = int(pd.Timestamp(timestamp).timestamp() // 60)
+        bucket = minute // self.minutes
 
-    true_range = pd.concat(
-        [high_low, high_close, low_close],
-        axis=1
-    ).max(axis=1)
+        # A gap can skip a bar's last minute; the bar is complete once a later bar starts.
+        if self.bar is not None and bucket != self.bucket:
+            self._complete_bar()
 
-    df["atr_7"] = true_range.rolling(7).mean()
-    df["atr_14"] = true_range.rolling(14).mean()
+        if self.bar is None:
+            self.bucket = bucket
+            self.bar = [high, low, close]
+        else:
+            self.bar[0] = max(self.bar[0], high)
+            self.bar[1] = min(self.bar[1], low)
+            self.bar[2] = close
 
-    df["ret_std_5"] = df["log_ret_1"].rolling(5).std()
-    df["ret_std_15"] = df["log_ret_1"].rolling(15).std()
+        if (minute + 1) % self.minutes == 0:
+            self._complete_bar()
+        return self.values
 
-    vol_mean = df["volume"].rolling(20).mean()
-    vol_std = df["volume"].rolling(20).std()
 
-    df["vol_zscore"] = (df["volume"] - vol_mean) / vol_std
-    df["vol_spike"] = (df["vol_zscore"] > 2).astype(int)
+class StreamingFeatures:
+    """Incremental version of build_features for live use.
 
-    feature_columns = [
-        "log_ret_1", "log_ret_3", "log_ret_5",
-        "candle_body", "candle_range",
-        "rsi_5", "rsi_9", "rsi_14",
-        "ema9_dist", "ema21_dist",
-        "atr_7", "atr_14",
-        "ret_std_5", "ret_std_15",
-        "vol_zscore", "vol_spike"
-    ]
+    Call ``update`` once per closed candle; every feature is updated in
+    constant time from rolling-sum, EMA and RSI state instead of
+    recomputing the whole lookback. Values match build_features on the same
+    candle history up to floating-point rounding. EMAs are seeded from the
+    first candle seen, so warm up on enough history for them to converge.
+    Higher ``timeframes`` need candle timestamps and ``htf_warmup_bars``
+    of history.
+    """
+
+    def __init__(self, timeframes=()):
+        self.closes = deque(maxlen=6)
+        self.rsi_gain = {period: RollingWindow(period) for period in (5, 9, 14)}
+        self.rsi_loss = {period: RollingWindow(period) for period in (5, 9, 14)}
+        self.ema = {9: math.nan, 21: math.nan}
+        self.true_range = {period: RollingWindow(period) for period in (7, 14)}
+        self.log_ret = {period: RollingWindow(period) for period in (5, 15)}
+        self.volume = RollingWindow(20)
+        self.htf = {tf: HigherTimeframeBars(HTF_MINUTES[tf]) for tf in timeframes}
+        self.columns = feature_columns(timeframes)
+        self.last_features = None
+
+    def warm_up(self, df):
+        """Feed historical candles (OHLCV frame) and return the latest features."""
+        for timestamp, *row in df[["open", "high", "low", "close", "volume"]].itertuples(index=True):
+            self.update(*row, timestamp=timestamp)
+        return self.last_features
+
+    def update(self, open_, high, low, close, volume, timestamp=None):
+        """Add one closed candle; returns features in ``self.columns`` order.
+
+        Returns None while any feature is still in its warm-up (NaN) period.
+        """
+        if self.htf and timestamp is None:
+            raise ValueError("timestamp is required with higher timeframes")
+
+        prev_close = self.closes[-1] if self.closes else math.nan
+        self.closes.append(close)
+
+        def log_ret(lag):
+            return math.log(close / self.closes[-1 - lag]) if len(self.closes) > lag else math.nan
+
+        log_ret_1 = log_ret(1)
+
+        if not math.isnan(prev_close):
+            delta = close - prev_close
+            for period in self.rsi_gain:
+                self.rsi_gain[period].push(max(delta, 0.0))
+                self.rsi_loss[period].push(-min(delta, 0.0))
+
+        rsi = {
+            period: _rsi(self.rsi_gain[period].mean(), self.rsi_loss[period].mean())
+            for period in self.rsi_gain
+        }
+
+        for span in self.ema:
+            alpha = 2 / (span + 1)
+            if math.isnan(self.ema[span]):
+                self.ema[span] = close
+            else:
+                # Same update order as ewm(adjust=False) so the values match bit for bit.
+                self.ema[span] = ((1 - alpha) * self.ema[span] + alpha * close) / ((1 - alpha) + alpha)
+
+        ranges = [high - low]
+        if not math.isnan(prev_close):
+            ranges += [abs(high - prev_close), abs(low - prev_close)]
+        for window in self.true_range.values():
+            window.push(max(ranges))
+
+        if not math.isnan(log_ret_1):
+            for window in self.log_ret.values():
+                window.push(log_ret_1)
+
+        self.volume.push(volume)
+        vol_std = self.volume.std()
+        with np.errstate(divide="ignore", invalid="ignore"):
+            vol_zscore = float((np.float64(volume) - self.volume.mean()) / np.float64(vol_std))
+
+        htf_values = [
+            value for bars in self.htf.values() for value in bars.update(timestamp, high, low, close)
+        ]
+
+        features = np.array([
+            log_ret_1,
+            log_ret(3),
+            log_ret(5),
+            close - open_,
+            high - low,
+            rsi[5],
+            rsi[9],
+            rsi[14],
+            close - self.ema[9],
+            close - self.ema[21],
+            self.true_range[7].mean(),
+            self.true_range[14].mean(),
+            self.log_ret[5].std(),
+            self.log_ret[15].std(),
+            vol_zscore,
+            float(vol_zscore > 2),
+            *htf_values,
+        ])
+
+        self.last_features = None if np.isnan(features).any() else features
+        return self.last_features
+
+
+def feature_parts_dir(features_path=FEATURES_PATH):
+    """Directory of the part files appended to ``features_path`` by append_features."""
+    return os.path.splitext(features_path)[0] + ".parts"
+
+
+def _footer_digest(path):
+    """Hash of a parquet file's footer (schema, row groups, statistics), read from its last bytes."""
+    with open(path, "rb") as f:
+        f.seek(-8, os.SEEK_END)
+        length = int.from_bytes(f.read(4), "little")
+        f.seek(-(8 + length), os.SEEK_END)
+        return hashlib.sha256(f.read(length)).hexdigest()[:16]
+
+
+def _current_parts_dir(features_path):
+    return os.path.join(feature_parts_dir(features_path), _footer_digest(features_path))
+
+
+def feature_files(features_path=FEATURES_PATH):
+    """The feature file followed by the parts appended to it, in time order.
+
+    Parts are kept under the footer digest of the file they extend, so parts
+    appended before a full rebuild (or a cache restore) of the file are ignored.
+    """
+    parts_dir = _current_parts_dir(features_path)
+    return [features_path, *sorted(glob.glob(os.path.join(parts_dir, "part-*.parquet")))]
+
+
+def load_features(features_path=FEATURES_PATH, columns=None):
+    """Feature matrix stored at ``features_path``, including appended parts."""
+    return pd.read_parquet(feature_files(features_path), columns=columns)
+
+
+def append_features(symbol=symbols.DEFAULT_SYMBOL, features_path=FEATURES_PATH, warmup_bars=WARMUP_BARS):
+    """Compute features only for candles newer than the existing feature file.
+
+    Reads the last stored timestamp from the row-group statistics in the
+    footer of the newest file, loads only the raw candles from a warm-up
+    tail before it onwards (enough for every rolling window and for the EMAs
+    to converge) and writes the new rows as one more part file, so stored
+    rows are never read or rewritten. Higher timeframes stored in the file
+    are recomputed with a longer tail.
+    """
+    files = feature_files(features_path)
+    last_ts = max(dataset.timestamp_bounds(path)[2] for path in files)
+    schema = pq.read_schema(features_path)
+    timeframes = stored_timeframes(schema.names)
+
+    start = last_ts - pd.Timedelta(minutes=max(warmup_bars, htf_warmup_bars(timeframes)))
+    df = dataset.load_ohlcv(symbol, start=start)
+
+    X_new = build_features(df, timeframes)
+    X_new = X_new[X_new.index > last_ts]
+    rows = sum(pq.read_metadata(path).num_rows for path in files)
+    if X_new.empty:
+        return X_new, rows
+
+    parts_dir = _current_parts_dir(features_path)
+    # Parts of older versions of the file are never read again.
+    for stale in glob.glob(os.path.join(feature_parts_dir(features_path), "*")):
+        if stale != parts_dir:
+            shutil.rmtree(stale)
+    os.makedirs(parts_dir, exist_ok=True)
+    part_path = os.path.join(parts_dir, f"part-{X_new.index[0]:%Y%m%dT%H%M}.parquet")
+    pq.write_table(pa.Table.from_pandas(X_new).cast(schema), part_path)
+    return X_new, rows + len(X_new)
+
+
+def build_symbol_features(symbol, precision=DEFAULT_PRECISION, append=False, timeframes=()):
+    """Build (or append) the feature file of one symbol and return its manifest entry."""
+    path = symbols.features_path(symbol)
+
+    if append and os.path.exists(path):
+        X_new, total = append_features(symbol, path)
+        print(f"{symbol}: appended rows:", len(X_new))
+        X = load_features(path, columns=[])
+    else:
+        df = dataset.load_ohlcv(symbol)
+
+        X = apply_precision(build_features(df, timeframes), precision)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        X.to_parquet(path)
+        shutil.rmtree(feature_parts_dir(path), ignore_errors=True)
+        report_memory(f"features {symbol}", raw=df, features=X)
+
+    columns = [name for name in pq.read_schema(path).names if name != "timestamp"]
+    print(f"{symbol}: feature matrix saved to {path}")
+    print("Shape:", (len(X), len(columns)))
+    return {
+        "symbol": symbol,
+        "path": path,
+        "rows": len(X),
+        "timeframes": stored_timeframes(columns),
+        "start": X.index.min(),
+        "end": X.index.max(),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the feature matrix from raw 1m candles.")
+    parser.add_argument(
+        "--append",
+        action="store_true",
+        help="Only compute features for candles newer than the existing feature file.",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=DEFAULT_PRECISION,
+        help="Float dtype for stored feature columns (vol_spike is always int8).",
+    )
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols, e.g. BTC/USDT,ETH/USDT. Each is written to its own feature file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Symbols processed in parallel processes.",
+    )
+    parser.add_argument(
+        "--timeframes",
+        type=parse_timeframes,
+        default=[],
+        help=f"Comma-separated higher timeframes to add ({', '.join(HTF_MINUTES)}). Ignored with --append.",
+    )
+    args = parser.parse_args()
 
-    X = df[feature_columns].dropna()
-    X.to_parquet("data/features/btcusdt_features.parquet")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
 
-    print("Feature matrix saved")
-    print("Shape:", X.shape)
+    entries = symbols.run_per_symbol(
+        build_symbol_features,
+        args.symbols,
+        args.workers,
+        precision=args.precision,
+        append=args.append,
+        timeframes=args.timeframes,
+    )
+    total = symbols.write_manifest(MANIFEST_PATH, entries)
+    print(f"Processed {len(entries)} symbol(s); manifest with {total} file(s) saved to:", MANIFEST_PATH)
 
 
 if __name__ == "__main__":
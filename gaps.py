@@ -0,0 +1,142 @@
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+
+import dataset
+import download_data
+import symbols
+
+GAP_INDEX_NAME = "gaps.json"
+
+
+def gap_index_path(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=dataset.DATASET_DIR):
+    return os.path.join(dataset.partition_dir(symbol, dataset_dir), GAP_INDEX_NAME)
+
+
+def stored_times(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=dataset.DATASET_DIR):
+    """Sorted open times of the stored candles, reading only the timestamp column."""
+    table = pq.read_table(dataset.raw_files(symbol, dataset_dir), columns=["timestamp"])
+    return pd.DatetimeIndex(table.column("timestamp").to_pandas()).sort_values()
+
+
+def find_gaps(times):
+    """Missing 1m candles in sorted open times ``times``.
+
+    Returns (first_missing, last_missing) timestamp pairs, one per hole.
+    """
+    minutes = times.as_unit("s").asi8 // 60
+    holes = np.flatnonzero(np.diff(minutes) > 1)
+    step = pd.Timedelta(minutes=1)
+    return [(times[i] + step, times[i + 1] - step) for i in holes]
+
+
+def gap_minutes(gaps):
+    return sum(int((end - start) / pd.Timedelta(minutes=1)) + 1 for start, end in gaps)
+
+
+def load_gap_index(symbol=symbols.DEFAULT_SYMBOL, dataset_dir=dataset.DATASET_DIR):
+    """Holes recorded by the last repair as (start, end) pairs; empty when never repaired."""
+    path = gap_index_path(symbol, dataset_dir)
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [(pd.Timestamp(gap["start"]), pd.Timestamp(gap["end"])) for gap in json.load(f)["gaps"]]
+
+
+def save_gap_index(symbol, gaps, dataset_dir=dataset.DATASET_DIR):
+    path = gap_index_path(symbol, dataset_dir)
+    index = {
+        "symbol": symbol,
+        "checked_at": pd.Timestamp.now(tz="UTC").isoformat(),
+        "missing_minutes": gap_minutes(gaps),
+        "gaps": [
+            {"start": start.isoformat(), "end": end.isoformat(), "minutes": gap_minutes([(start, end)])}
+            for start, end in gaps
+        ],
+    }
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".tmp", "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(path + ".tmp", path)
+
+
+def fetch_range(exchange, symbol, start, end):
+    """Candles with start <= open time <= end (ms), paging forward from ``start``."""
+    candles = []
+    since = start
+    while since <= end:
+        page = exchange.fetch_ohlcv(
+            symbol=symbol,
+            timeframe=download_data.timeframe,
+            since=since,
+            limit=download_data.limit
+        )
+        page = [candle for candle in page if since <= candle[0] <= end]
+        if not page:
+            break
+        candles.extend(page)
+        since = page[-1][0] + 60_000
+        time.sleep(exchange.rateLimit / 1000)
+    return candles
+
+
+def repair_gaps(symbol=symbols.DEFAULT_SYMBOL, exchange=None, dataset_dir=dataset.DATASET_DIR, retry=False):
+    """Refetch only the missing minute ranges of ``symbol`` and merge them into its partitions.
+
+    Holes already recorded in the gap index were refetched before and came
+    back empty (exchange downtime), so they are skipped unless ``retry``.
+    The holes left afterwards are written to the gap index. Returns
+    (filled_minutes, remaining_gaps).
+    """
+    times = stored_times(symbol, dataset_dir)
+    gaps = find_gaps(times)
+    known = set() if retry else set(load_gap_index(symbol, dataset_dir))
+    todo = [gap for gap in gaps if gap not in known]
+
+    candles = []
+    if todo:
+        exchange = exchange or download_data.make_exchange()
+        for start, end in todo:
+            candles.extend(fetch_range(exchange, symbol, int(start.timestamp() * 1000), int(end.timestamp() * 1000)))
+
+    if candles:
+        dataset.write_partitions(download_data.candles_to_frame(candles), symbol, dataset_dir)
+        gaps = find_gaps(stored_times(symbol, dataset_dir))
+
+    save_gap_index(symbol, gaps, dataset_dir)
+    return len(candles), gaps
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Find missing 1m candles in the raw dataset and refetch only those ranges."
+    )
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols to repair.",
+    )
+    parser.add_argument(
+        "--retry",
+        action="store_true",
+        help="Also refetch holes the gap index already marks as unrecoverable.",
+    )
+    args = parser.parse_args()
+
+    exchange = download_data.make_exchange()
+    for symbol in args.symbols:
+        filled, gaps = repair_gaps(symbol, exchange, retry=args.retry)
+        print(
+            f"{symbol}: filled {filled} candle(s); {len(gaps)} gap(s), {gap_minutes(gaps)} minute(s) still missing"
+        )
+        print("Gap index saved to:", gap_index_path(symbol))
+
+
+if __name__ == "__main__":
+    main()
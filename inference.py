@@ -0,0 +1,104 @@
+import argparse
+import os
+
+import joblib
+import numpy as np
+import xgboost as xgb
+
+from features import feature_columns, stored_timeframes
+from fingerprint import file_digest
+
+
+MODEL_PATH = "data/models/xgb_tp_sl_model.pkl"
+
+
+def native_path(model_path=MODEL_PATH):
+    """Native XGBoost (UBJSON) copy of a pickled model, next to it."""
+    return os.path.splitext(model_path)[0] + ".ubj"
+
+
+def source_path(model_path=MODEL_PATH):
+    """Digest of the pickle the native copy was exported from."""
+    return native_path(model_path) + ".sha256"
+
+
+def export_native(model_path=MODEL_PATH, model=None):
+    """Save the booster of the pickled classifier at ``model_path`` (or ``model``) in native format.
+
+    The pickle's digest is written next to the native copy, so a pickle
+    restored or replaced later is detected by content, not by mtime.
+    """
+    path = native_path(model_path)
+    model = joblib.load(model_path) if model is None else model
+    model.get_booster().save_model(path)
+    with open(source_path(model_path), "w") as f:
+        f.write(file_digest(model_path))
+    return path
+
+
+def is_current(model_path=MODEL_PATH):
+    """True when the native copy was exported from the pickle now at ``model_path``."""
+    try:
+        with open(source_path(model_path)) as f:
+            stored = f.read().strip()
+    except FileNotFoundError:
+        return False
+    return os.path.exists(native_path(model_path)) and stored == file_digest(model_path)
+
+
+class Predictor:
+    """Single-row predictions straight from a native booster.
+
+    Features are written into a preallocated float32 row in
+    ``feature_columns(timeframes)`` order and scored with
+    ``Booster.inplace_predict``, skipping the DataFrame conversion and
+    feature-name validation of ``XGBClassifier.predict_proba``. The column
+    order is checked against the booster's feature names once, at load.
+    """
+
+    def __init__(self, booster, timeframes=()):
+        self.columns = feature_columns(timeframes)
+        if booster.feature_names is not None and list(booster.feature_names) != self.columns:
+            raise ValueError(
+                f"Model features {booster.feature_names} do not match feature_columns({list(timeframes)})"
+            )
+        booster.set_param({"nthread": 1})
+        self.booster = booster
+        self._row = np.empty((1, len(self.columns)), dtype=np.float32)
+
+    def predict(self, features):
+        """Probability of class 1 for one row of features in ``self.columns`` order."""
+        self._row[0] = features
+        return float(self.booster.inplace_predict(self._row, validate_features=False)[0])
+
+
+def load_predictor(model_path=MODEL_PATH, timeframes=None):
+    """Predictor for the model at ``model_path``, exporting its native copy when missing or stale.
+
+    Staleness is decided by the pickle's digest (see export_native).
+    ``timeframes`` defaults to the higher timeframes the model was trained with.
+    """
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(f"Model not found at {model_path}. Run train_xgboost.py first.")
+    if not is_current(model_path):
+        export_native(model_path)
+    booster = xgb.Booster(model_file=native_path(model_path))
+    if timeframes is None:
+        timeframes = stored_timeframes(booster.feature_names or [])
+    return Predictor(booster, timeframes)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export the trained model in native XGBoost format for the live inference path."
+    )
+    parser.add_argument("--model-path", default=MODEL_PATH, help="Pickled model from train_xgboost.py.")
+    args = parser.parse_args()
+
+    path = export_native(args.model_path)
+    predictor = load_predictor(args.model_path)
+    print(f"Native model saved to: {path} ({len(predictor.columns)} features)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+import numpy as np
+
+
+def _as_float(x):
+    return np.ascontiguousarray(x, dtype=np.float64)
+
+
+def trailing_sums(x, windows):
+    """Trailing-window sums of ``x`` for several windows at once.
+
+    Builds power-of-two window sums by doubling (S_2p = S_p + S_p shifted by
+    p) and composes each requested window from the binary digits of its
+    width, so a window of w costs O(log w) contiguous adds instead of w.
+    Positions without a full window are NaN, as are windows containing a
+    NaN, matching ``Series.rolling(w).sum()``.
+    """
+    x = _as_float(x)
+    windows = sorted(set(windows))
+    n = len(x)
+
+    sums, covered = {}, {}
+    power, width = x, 1
+    while width <= windows[-1]:
+        for w in windows:
+            if not w & width:
+                continue
+            if w not in sums:
+                sums[w] = power.copy()
+                covered[w] = width
+            else:
+                c = covered[w]
+                sums[w][c:] += power[:n - c]
+                covered[w] += width
+        if width * 2 <= windows[-1]:
+            doubled = power.copy()
+            doubled[width:] += power[:n - width]
+            power = doubled
+        width *= 2
+
+    for w in windows:
+        sums[w][:w - 1] = np.nan
+    return sums
+
+
+def rolling_mean(x, windows):
+    return {w: np.divide(s, w, out=s) for w, s in trailing_sums(x, windows).items()}
+
+
+def rolling_mean_std(x, windows):
+    """Rolling mean and sample (ddof=1) standard deviation for several windows."""
+    x = _as_float(x)
+    sums = trailing_sums(x, windows)
+    sums_sq = trailing_sums(np.square(x), windows)
+
+    means, stds = {}, {}
+    for w, s in sums.items():
+        means[w] = np.divide(s, w, out=s)
+        # Reuse the sum-of-squares buffer for the variance to avoid temporaries.
+        var = sums_sq[w]
+        var -= means[w] * means[w] * w
+        var /= w - 1
+        np.maximum(var, 0.0, out=var)
+        stds[w] = np.sqrt(var, out=var)
+    return means, stds
+
+
+def rolling_std(x, windows):
+    return rolling_mean_std(x, windows)[1]
+
+
+def log_returns(close, lags):
+    close = _as_float(close)
+    out = {}
+    for lag in lags:
+        ret = np.full(len(close), np.nan)
+        ret[lag:] = np.log(close[lag:] / close[:-lag])
+        out[lag] = ret
+    return out
+
+
+def true_range(high, low, close):
+    """max(high - low, |high - prev close|, |low - prev close|); first row is high - low."""
+    high, low, close = _as_float(high), _as_float(low), _as_float(close)
+    tr = high - low
+    prev_close = close[:-1]
+    np.maximum(tr[1:], np.abs(high[1:] - prev_close), out=tr[1:])
+    np.maximum(tr[1:], np.abs(low[1:] - prev_close), out=tr[1:])
+    return tr
+
+
+def atr(high, low, close, windows):
+    return rolling_mean(true_range(high, low, close), windows)
+
+
+def rsi(close, windows):
+    """Simple-moving-average RSI for several windows from one diff pass."""
+    close = _as_float(close)
+    delta = np.empty_like(close)
+    delta[0] = np.nan
+    np.subtract(close[1:], close[:-1], out=delta[1:])
+
+    gain = np.where(delta > 0, delta, 0.0)
+    loss = np.where(delta < 0, -delta, 0.0)
+    gain[0] = loss[0] = np.nan
+
+    avg_gain = rolling_mean(gain, windows)
+    avg_loss = rolling_mean(loss, windows)
+
+    out = {}
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for w in windows:
+            out[w] = 100 - (100 / (1 + avg_gain[w] / avg_loss[w]))
+    return out
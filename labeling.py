@@ -1,9 +1,19 @@
-import pandas as pd
+import argparse
 import os
-import sys
+
+import numpy as np
+import pandas as pd
+
+import dataset
+import symbols
+from features import load_features
+from storage import DEFAULT_PRECISION, PRECISIONS, apply_precision, report_memory
 
 SL_PCT = 0.0008   # -0.08%
 MAX_HOLD = 5      # candles (minutes)
+GAP_LABEL = -2    # forward window spans missing candles
+LABEL_MATRIX_PATH = symbols.label_matrix_path(symbols.DEFAULT_SYMBOL)
+MANIFEST_PATH = "data/labeled/manifest.json"
 
 
 def label_trade(df, entry_time, tp_pct):
@@ -25,38 +35,240 @@ def label_trade(df, entry_time, tp_pct):
     return -1  # timeout
 
 
-def main():
-    os.makedirs("data/labeled", exist_ok=True)
+def forward_window(values, max_hold=MAX_HOLD):
+    """Return an (n, max_hold) view of the max_hold values following each row.
+
+    Rows near the end of the series are padded with NaN, which never
+    satisfies a TP/SL comparison, so they behave like a shorter future.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    padded = np.concatenate([values[1:], np.full(max_hold, np.nan)])
+    return np.lib.stride_tricks.sliding_window_view(padded, max_hold)[: len(values)]
+
+
+def contiguous_windows(index, max_hold=MAX_HOLD):
+    """True where the ``max_hold`` candles after each row are consecutive minutes.
+
+    ``index`` holds sorted candle open times. Near the end of the series the
+    shorter remaining window is checked.
+    """
+    minutes = index.as_unit("s").asi8 // 60
+    positions = np.arange(len(minutes))
+    ahead = np.minimum(positions + max_hold, len(minutes) - 1)
+    return minutes[ahead] - minutes[positions] == ahead - positions
+
+
+def _first_hit_labels(future_high, future_low, entry_price, tp_pct, sl_pct):
+    tp_price = entry_price * (1 + tp_pct)
+    sl_price = entry_price * (1 - sl_pct)
+
+    tp_hit = future_high >= tp_price[:, None]
+    any_hit = tp_hit | (future_low <= sl_price[:, None])
+
+    first_hit = any_hit.argmax(axis=1)
+    labels = np.where(tp_hit[np.arange(len(first_hit)), first_hit], 1, 0)
+    labels[~any_hit.any(axis=1)] = -1
+    return labels
+
+
+def _entry_windows(df, entry_times, max_hold):
+    positions = df.index.get_indexer(entry_times)
+    if (positions < 0).any():
+        missing = entry_times[positions < 0]
+        raise KeyError(f"{len(missing)} entry times not found in market data, e.g. {missing[0]}")
+
+    future_high = forward_window(df["high"].values, max_hold)[positions]
+    future_low = forward_window(df["low"].values, max_hold)[positions]
+    entry_price = df["close"].values.astype(np.float64)[positions]
+    contiguous = contiguous_windows(df.index, max_hold)[positions]
+    return future_high, future_low, entry_price, contiguous
+
+
+def label_array(high, low, close, tp_pct, sl_pct=SL_PCT, max_hold=MAX_HOLD, entries=None):
+    """Vectorized equivalent of label_trade for every position in ``entries``.
+
+    Returns 1 when TP is hit first, 0 when SL is hit first and -1 on timeout.
+    Within a single candle TP is checked before SL, as in label_trade.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    if entries is None:
+        entries = np.arange(len(close))
+
+    return _first_hit_labels(
+        forward_window(high, max_hold)[entries],
+        forward_window(low, max_hold)[entries],
+        close[entries],
+        tp_pct,
+        sl_pct,
+    )
+
+
+def label_entries(df, entry_times, tp_pct, sl_pct=SL_PCT, max_hold=MAX_HOLD):
+    """Label every timestamp in ``entry_times`` against the OHLC frame ``df``.
+
+    Entries whose forward window spans missing candles get GAP_LABEL: the
+    price path inside the hole is unknown.
+    """
+    future_high, future_low, entry_price, contiguous = _entry_windows(df, entry_times, max_hold)
+    labels = _first_hit_labels(future_high, future_low, entry_price, tp_pct, sl_pct)
+    labels[~contiguous] = GAP_LABEL
+    return pd.Series(labels, index=entry_times, name="label")
 
-    tp_pct = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0023
-    print(f"Labeling with TP_PCT={tp_pct}")
 
-    df = pd.read_parquet("data/raw/btcusdt_1m.parquet")
-    df = df.set_index("timestamp").sort_index()
+def label_column(tp_pct, sl_pct=SL_PCT):
+    return f"label_tp{tp_pct:g}_sl{sl_pct:g}"
 
-    X = pd.read_parquet("data/features/btcusdt_features.parquet")
 
-    labels = []
-    for ts in X.index:
-        labels.append(label_trade(df, ts, tp_pct))
+def label_matrix(df, entry_times, tp_values, sl_values=(SL_PCT,), max_hold=MAX_HOLD):
+    """Label every entry for each (tp, sl) pair from one set of forward windows.
 
-    y = pd.Series(labels, index=X.index, name="label")
+    Returns an int8 frame with one ``label_column(tp, sl)`` column per pair.
+    Timeouts stay in the matrix as -1 (and gap-spanning windows as GAP_LABEL)
+    so any column can be selected later.
+    """
+    future_high, future_low, entry_price, contiguous = _entry_windows(df, entry_times, max_hold)
+
+    columns = {}
+    for tp_pct in tp_values:
+        for sl_pct in sl_values:
+            labels = _first_hit_labels(future_high, future_low, entry_price, tp_pct, sl_pct)
+            labels[~contiguous] = GAP_LABEL
+            columns[label_column(tp_pct, sl_pct)] = labels.astype(np.int8)
+
+    return pd.DataFrame(columns, index=entry_times)
+
+
+def build_labeled(X, y):
+    """Join features with labels, dropping timeouts (-1) and gap-spanning windows."""
+    mask = y >= 0
+    data = X.loc[mask].copy()
+    data["label"] = y.loc[mask].astype(np.int8)
+    return data
+
+
+def select_label(X, matrix, tp_pct, sl_pct=SL_PCT):
+    """Build the labeled dataset for one (tp, sl) pair of a label matrix."""
+    column = label_column(tp_pct, sl_pct)
+    if column not in matrix.columns:
+        raise KeyError(
+            f"{column} not in label matrix. Available: {', '.join(matrix.columns)}"
+        )
+    y = matrix[column].reindex(X.index)
+    if y.isna().any():
+        raise ValueError("Label matrix does not cover every feature row. Relabel with --tp-grid.")
+    return build_labeled(X, y.rename("label"))
+
+
+def parse_float_csv(value):
+    return [float(x.strip()) for x in value.split(",") if x.strip()]
+
+
+def label_symbol(symbol, tp_pct, tp_grid=None, sl_grid=(SL_PCT,), matrix_path=None, precision=DEFAULT_PRECISION):
+    """Label one symbol's feature file and return its manifest entry.
+
+    Writes a label matrix when ``tp_grid`` is given, otherwise the labeled dataset.
+    """
+    df = dataset.load_ohlcv(symbol)
+
+    X = load_features(symbols.features_path(symbol))
+
+    if tp_grid:
+        path = matrix_path or symbols.label_matrix_path(symbol)
+        print(f"{symbol}: labeling TP grid {tp_grid} x SL grid {list(sl_grid)}")
+        matrix = label_matrix(df, X.index, tp_grid, sl_grid)
+        matrix.to_parquet(path)
+        report_memory(f"labeling {symbol}", raw=df, features=X, label_matrix=matrix)
+
+        summary = matrix.apply(lambda col: col.value_counts(normalize=True)).T
+        print(summary.round(4))
+        print("Label matrix saved to:", path)
+        print("Shape:", matrix.shape)
+        return {"symbol": symbol, "path": path, "rows": len(matrix), "columns": list(matrix.columns)}
+
+    path = symbols.labeled_path(symbol)
+    print(f"{symbol}: labeling with TP_PCT={tp_pct}")
+
+    y = label_entries(df, X.index, tp_pct)
 
     print(y.value_counts())
     print(y.value_counts(normalize=True))
 
-    mask = y != -1
-    X_labeled = X.loc[mask]
-    y_labeled = y.loc[mask]
-
-    data = X_labeled.copy()
-    data["label"] = y_labeled
+    data = apply_precision(build_labeled(X, y), precision)
 
-    data.to_parquet("data/labeled/btcusdt_labeled.parquet")
+    data.to_parquet(path)
+    report_memory(f"labeling {symbol}", raw=df, features=X, labeled=data)
 
-    print("Labeled dataset saved")
+    print("Labeled dataset saved to:", path)
     print("Shape:", data.shape)
     print(data["label"].value_counts())
+    return {"symbol": symbol, "path": path, "rows": len(data), "tp_pct": tp_pct}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Create TP/SL outcome labels for the feature matrix.")
+    parser.add_argument(
+        "tp_pct",
+        nargs="?",
+        type=float,
+        default=0.0023,
+        help="Take-profit percentage for the single-label dataset.",
+    )
+    parser.add_argument(
+        "--tp-grid",
+        type=parse_float_csv,
+        default=None,
+        help="Comma-separated TP values. Writes one wide label matrix instead of a labeled dataset.",
+    )
+    parser.add_argument(
+        "--sl-grid",
+        type=parse_float_csv,
+        default=[SL_PCT],
+        help="Comma-separated SL values used with --tp-grid.",
+    )
+    parser.add_argument(
+        "--matrix-path",
+        default=None,
+        help=f"Output path for the --tp-grid label matrix (default {LABEL_MATRIX_PATH}). Single symbol only.",
+    )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=DEFAULT_PRECISION,
+        help="Float dtype for stored feature columns (label is always int8).",
+    )
+    parser.add_argument(
+        "--symbols",
+        type=symbols.parse_symbols,
+        default=[symbols.DEFAULT_SYMBOL],
+        help="Comma-separated symbols, e.g. BTC/USDT,ETH/USDT. Each is written to its own file.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Symbols labeled in parallel processes.",
+    )
+    args = parser.parse_args()
+
+    if args.matrix_path and len(args.symbols) > 1:
+        raise ValueError("--matrix-path can only be used with a single symbol")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
+
+    os.makedirs("data/labeled", exist_ok=True)
+
+    entries = symbols.run_per_symbol(
+        label_symbol,
+        args.symbols,
+        args.workers,
+        tp_pct=args.tp_pct,
+        tp_grid=args.tp_grid,
+        sl_grid=args.sl_grid,
+        matrix_path=args.matrix_path,
+        precision=args.precision,
+    )
+    total = symbols.write_manifest(MANIFEST_PATH, entries)
+    print(f"Processed {len(entries)} symbol(s); manifest with {total} file(s) saved to:", MANIFEST_PATH)
 
 
 if __name__ == "__main__":
@@ -1,13 +1,15 @@
 import os
+import sys
 import time
 from datetime import datetime
 
 import ccxt
-import joblib
-import numpy as np
 import pandas as pd
 
-model = joblib.load("data/models/xgb_tp_sl_model.pkl")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from features import StreamingFeatures, htf_warmup_bars  # noqa: E402
+from inference import load_predictor  # noqa: E402
 
 exchange = ccxt.binance({
     "enableRateLimit": True,
@@ -26,86 +28,55 @@ def fetch_latest_candles(symbol="BTC/USDT", timeframe="1m", limit=200):
     return df
 
 
-def compute_features(df):
-    df = df.copy()
-
-    df["log_ret_1"] = np.log(df["close"] / df["close"].shift(1))
-    df["log_ret_3"] = np.log(df["close"] / df["close"].shift(3))
-    df["log_ret_5"] = np.log(df["close"] / df["close"].shift(5))
-
-    df["candle_body"] = df["close"] - df["open"]
-    df["candle_range"] = df["high"] - df["low"]
-
-    def compute_rsi(series, period):
-        delta = series.diff()
-        gain = delta.clip(lower=0)
-        loss = -delta.clip(upper=0)
-        avg_gain = gain.rolling(period).mean()
-        avg_loss = loss.rolling(period).mean()
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
-
-    df["rsi_5"] = compute_rsi(df["close"], 5)
-    df["rsi_9"] = compute_rsi(df["close"], 9)
-    df["rsi_14"] = compute_rsi(df["close"], 14)
-
-    df["ema_9"] = df["close"].ewm(span=9).mean()
-    df["ema_21"] = df["close"].ewm(span=21).mean()
-    df["ema9_dist"] = df["close"] - df["ema_9"]
-    df["ema21_dist"] = df["close"] - df["ema_21"]
-
-    high_low = df["high"] - df["low"]
-    high_close = (df["high"] - df["close"].shift()).abs()
-    low_close = (df["low"] - df["close"].shift()).abs()
-    tr = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
+def closed_candles(df):
+    # The last candle returned by fetch_ohlcv is usually still forming.
+    now = pd.Timestamp(exchange.milliseconds(), unit="ms", tz="UTC")
+    return df[df.index + pd.Timedelta(minutes=1) <= now]
 
-    df["atr_7"] = tr.rolling(7).mean()
-    df["atr_14"] = tr.rolling(14).mean()
 
-    df["ret_std_5"] = df["log_ret_1"].rolling(5).std()
-    df["ret_std_15"] = df["log_ret_1"].rolling(15).std()
-
-    vol_mean = df["volume"].rolling(20).mean()
-    vol_std = df["volume"].rolling(20).std()
-    df["vol_zscore"] = (df["volume"] - vol_mean) / vol_std
-    df["vol_spike"] = (df["vol_zscore"] > 2).astype(int)
-
-    return df
+def start_engine():
+    # Higher-timeframe state is built once from history, then updated per 1m candle.
+    history = closed_candles(fetch_latest_candles(limit=max(200, htf_warmup_bars(TIMEFRAMES) + 1)))
+    engine = StreamingFeatures(TIMEFRAMES)
+    engine.warm_up(history)
+    return engine, history.index[-1]
 
 
 TP_PCT = 0.0020
 SL_PCT = 0.0008
 MAX_HOLD = 5
 PROB_THRESHOLD = 0.65
+TIMEFRAMES = []  # must match features.py --timeframes used for the model
 
+# Native booster scoring engine.last_features (already in feature_columns(TIMEFRAMES) order).
+model = load_predictor("data/models/xgb_tp_sl_model.pkl", TIMEFRAMES)
+engine, last_ts = start_engine()
 
 while True:
     try:
-        df = fetch_latest_candles()
-        df = compute_features(df)
-
-        latest = df.iloc[-1:]
-
-        feature_columns = [
-            "log_ret_1", "log_ret_3", "log_ret_5",
-            "candle_body", "candle_range",
-            "rsi_5", "rsi_9", "rsi_14",
-            "ema9_dist", "ema21_dist",
-            "atr_7", "atr_14",
-            "ret_std_5", "ret_std_15",
-            "vol_zscore", "vol_spike",
-        ]
-        X_live = latest[feature_columns].dropna()
-
-        if X_live.empty:
+        candles = closed_candles(fetch_latest_candles(limit=5))
+        new_candles = candles[candles.index > last_ts]
+
+        if not new_candles.empty and new_candles.index[0] - last_ts > pd.Timedelta(minutes=1):
+            # Missed candles (e.g. after an outage): rebuild state from a full lookback.
+            engine, last_ts = start_engine()
+            new_candles = new_candles.iloc[0:0]
+
+        for ts, candle in new_candles.iterrows():
+            engine.update(
+                candle["open"], candle["high"], candle["low"], candle["close"], candle["volume"], timestamp=ts
+            )
+            last_ts = ts
+
+        if new_candles.empty or engine.last_features is None:
             time.sleep(60)
             continue
 
-        prob = model.predict_proba(X_live)[0, 1]
+        prob = model.predict(engine.last_features)
 
         log_row = {
             "time": datetime.utcnow(),
-            "price": latest["close"].values[0],
+            "price": engine.closes[-1],
             "probability": prob,
         }
 
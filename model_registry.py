@@ -0,0 +1,104 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost
+
+from fingerprint import frame_digest, params_digest
+
+
+REGISTRY_DIR = "data/models/registry"
+MAX_ENTRIES = 50
+MAX_BYTES = 512 * 2**20
+
+
+def training_key(splits, params):
+    """Hash of everything that determines a fitted model: train/val splits, parameters and XGBoost version.
+
+    The test split only feeds evaluation, so it is not part of the key.
+    Labels are hashed by value, so Series (in-process) and arrays (loaded
+    splits) give the same key.
+    """
+    return params_digest({
+        "splits": {
+            "X_train": frame_digest(splits["X_train"]),
+            "y_train": frame_digest(pd.Series(np.asarray(splits["y_train"]))),
+            "X_val": frame_digest(splits["X_val"]),
+            "y_val": frame_digest(pd.Series(np.asarray(splits["y_val"]))),
+        },
+        "params": params,
+        "xgboost": xgboost.__version__,
+    })[:32]
+
+
+class ModelRegistry:
+    """Trained models stored under ``<registry_dir>/<key>.pkl``.
+
+    Keys come from training_key, so an unchanged split and parameter set is
+    a lookup instead of a fit. File mtimes double as last-use times: a hit
+    touches the entry, and after each store the least recently used entries
+    are evicted until at most ``max_entries`` remain within ``max_bytes``.
+    Entries are single files written by rename, so concurrent sweep workers
+    can share one registry: a file another worker evicts in between is
+    treated as a miss or skipped, never as an error.
+    """
+
+    def __init__(self, registry_dir=REGISTRY_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.registry_dir = registry_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def _path(self, key):
+        return os.path.join(self.registry_dir, f"{key}.pkl")
+
+    def get(self, key):
+        """Return the stored model for ``key`` or None."""
+        path = self._path(key)
+        try:
+            model = joblib.load(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return model
+
+    def put(self, key, model, params=None):
+        os.makedirs(self.registry_dir, exist_ok=True)
+        path = self._path(key)
+        joblib.dump(model, path + ".tmp")
+        os.replace(path + ".tmp", path)
+        with open(os.path.join(self.registry_dir, f"{key}.json"), "w") as f:
+            json.dump({"params": params}, f, indent=2, default=str)
+        self.evict()
+
+    def entries(self):
+        """(key, size, mtime) of stored models, least recently used first."""
+        if not os.path.isdir(self.registry_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.registry_dir):
+            if name.endswith(".pkl"):
+                try:
+                    stat = os.stat(os.path.join(self.registry_dir, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((name[:-4], stat.st_size, stat.st_mtime_ns))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Drop least recently used models beyond the entry and size budgets; returns the keys dropped."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        dropped = []
+        # The newest entry is always kept, even when it alone exceeds max_bytes.
+        while len(entries) > 1 and (len(entries) > self.max_entries or total > self.max_bytes):
+            key, size, _ = entries.pop(0)
+            for suffix in (".pkl", ".json"):
+                try:
+                    os.remove(os.path.join(self.registry_dir, key + suffix))
+                except FileNotFoundError:
+                    pass
+            total -= size
+            dropped.append(key)
+        return dropped
@@ -0,0 +1,188 @@
+import os
+import time
+import tracemalloc
+
+from backtest import run_backtest
+from features import build_features
+from labeling import build_labeled, label_entries
+from model_registry import ModelRegistry
+from simulation import compute_atr_regime, load_market_data
+from storage import DEFAULT_PRECISION, apply_precision, nbytes
+from train_test_split import save_splits, split_dataset
+from train_xgboost import save_model, train_model
+from trade_simulation import simulate
+from trade_simulation_leverage import simulate_leveraged
+
+
+FEATURES_PATH = "data/features/btcusdt_features.parquet"
+LABELED_PATH = "data/labeled/btcusdt_labeled.parquet"
+SPLITS_DIR = "data/splits"
+MODEL_PATH = "data/models/xgb_tp_sl_model.pkl"
+TRADES_PATH = "data/results/trades.parquet"
+TRADES_LEVERAGE_PATH = "data/results/trades_leverage.parquet"
+
+
+class Stage:
+    """One pipeline step: ``func`` receives the outputs of ``deps`` in order.
+
+    ``persist`` optionally writes the stage output to disk; it only runs when
+    the pipeline is asked to persist intermediate artifacts.
+    """
+
+    def __init__(self, name, func, deps=(), persist=None):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.persist = persist
+
+
+def _ordered(stages):
+    by_name = {stage.name: stage for stage in stages}
+    ordered, visiting, done = [], set(), set()
+
+    def visit(name):
+        if name in done:
+            return
+        if name in visiting:
+            raise ValueError(f"Pipeline has a cycle at stage {name!r}")
+        if name not in by_name:
+            raise KeyError(f"Unknown pipeline stage {name!r}")
+        visiting.add(name)
+        for dep in by_name[name].deps:
+            visit(dep)
+        visiting.discard(name)
+        done.add(name)
+        ordered.append(by_name[name])
+
+    for stage in stages:
+        visit(stage.name)
+    return ordered
+
+
+def run_pipeline(stages, persist=False):
+    """Run ``stages`` in dependency order, keeping every output in memory.
+
+    Returns ``(outputs, report)`` where ``report`` holds wall time, peak
+    traced memory (Python and NumPy/pandas allocations) and the size of the
+    output kept in memory per stage.
+    """
+    outputs = {}
+    report = []
+
+    tracemalloc.start()
+    try:
+        for stage in _ordered(stages):
+            print(f"\n===== {stage.name} =====", flush=True)
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            start = time.perf_counter()
+
+            outputs[stage.name] = stage.func(*(outputs[dep] for dep in stage.deps))
+            if persist and stage.persist is not None:
+                stage.persist(outputs[stage.name])
+
+            seconds = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            report.append({
+                "stage": stage.name,
+                "seconds": seconds,
+                "peak_mb": (peak - base) / 1e6,
+                "held_mb": nbytes(outputs[stage.name]) / 1e6,
+            })
+    finally:
+        tracemalloc.stop()
+
+    return outputs, report
+
+
+def print_report(report):
+    print("\n===== STAGE REPORT =====")
+    print(f"{'Stage':<18} {'Wall time (s)':>14} {'Peak memory (MB)':>17} {'Output (MB)':>12}")
+    for row in report:
+        print(
+            f"{row['stage']:<18} {row['seconds']:>14.3f} {row['peak_mb']:>17.1f} {row['held_mb']:>12.1f}"
+        )
+    print(f"{'held in memory':<18} {'':>14} {'':>17} {sum(row['held_mb'] for row in report):>12.1f}")
+
+
+def _to_parquet(path):
+    def write(df):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        df.to_parquet(path)
+    return write
+
+
+def workflow_stages(
+    tp,
+    prob,
+    leverage=3.0,
+    initial_capital=1000.0,
+    capital_fraction=1.0,
+    precision=DEFAULT_PRECISION,
+    timeframes=(),
+):
+    """The run_full_workflow.py steps as in-process stages."""
+
+    def compact_features(raw):
+        return apply_precision(build_features(raw, timeframes), precision)
+
+    def label(raw, features):
+        y = label_entries(raw, features.index, tp)
+        print(y.value_counts())
+        return apply_precision(build_labeled(features, y), precision)
+
+    def signal_inputs(raw, splits, model):
+        inputs = compute_atr_regime(raw).loc[splits["X_test"].index, ["atr_14", "atr_med"]]
+        inputs.insert(0, "prob", model.predict_proba(splits["X_test"])[:, 1])
+        return inputs
+
+    def trades(raw, splits, inputs):
+        return simulate(raw, splits["X_test"], inputs["prob"].values, tp, prob, regime=inputs)
+
+    def trades_leverage(raw, splits, inputs):
+        return simulate_leveraged(
+            raw,
+            splits["X_test"],
+            inputs["prob"].values,
+            tp,
+            prob,
+            leverage=leverage,
+            initial_capital=initial_capital,
+            capital_fraction=capital_fraction,
+            regime=inputs,
+        )
+
+    def backtest(trades_df):
+        return run_backtest(tp, prob, trades=trades_df, leverage_hint=1.0, label="No Leverage")
+
+    def backtest_leverage(trades_df):
+        return run_backtest(
+            tp,
+            prob,
+            trades=trades_df,
+            leverage_hint=leverage,
+            label=f"With Leverage ({leverage}x)",
+        )
+
+    return [
+        Stage("raw", lambda: load_market_data()),
+        Stage("features", compact_features, ["raw"], persist=_to_parquet(FEATURES_PATH)),
+        Stage("labeled", label, ["raw", "features"], persist=_to_parquet(LABELED_PATH)),
+        Stage("splits", split_dataset, ["labeled"], persist=lambda s: save_splits(s, SPLITS_DIR)),
+        Stage(
+            "model",
+            lambda splits: train_model(splits, registry=ModelRegistry()),
+            ["splits"],
+            persist=lambda m: save_model(m, MODEL_PATH),
+        ),
+        Stage("signal_inputs", signal_inputs, ["raw", "splits", "model"]),
+        Stage("trades", trades, ["raw", "splits", "signal_inputs"], persist=_to_parquet(TRADES_PATH)),
+        Stage(
+            "trades_leverage",
+            trades_leverage,
+            ["raw", "splits", "signal_inputs"],
+            persist=_to_parquet(TRADES_LEVERAGE_PATH),
+        ),
+        Stage("backtest", backtest, ["trades"]),
+        Stage("backtest_leverage", backtest_leverage, ["trades_leverage"]),
+    ]
@@ -2,13 +2,17 @@ import pandas as pd
 import mplfinance as mpf
 import argparse
 
+import dataset
+import symbols
+
 
 def main():
     parser = argparse.ArgumentParser(description="Plot candlestick chart from parquet data.")
+    parser.add_argument("--symbol", default=symbols.DEFAULT_SYMBOL, help="Symbol to plot from the raw dataset.")
     parser.add_argument(
         "--path",
-        default="data/raw/btcusdt_1m.parquet",
-        help="Path to OHLCV parquet file.",
+        default=None,
+        help="Plot this OHLCV parquet file instead of the raw dataset.",
     )
     parser.add_argument(
         "--rows",
@@ -18,18 +22,21 @@ def main():
     )
     args = parser.parse_args()
 
-    df = pd.read_parquet(args.path)
-    df = df.set_index("timestamp")
-    df = df[["open", "high", "low", "close", "volume"]]
-
-    df_last = df.tail(args.rows)
+    if args.path:
+        df = pd.read_parquet(args.path)
+        df = df.set_index("timestamp")
+        df = df[["open", "high", "low", "close", "volume"]]
+        df_last = df.tail(args.rows)
+    else:
+        # Only the trailing row groups are read.
+        df_last = dataset.load_tail(args.symbol, args.rows)
 
     mpf.plot(
         df_last,
         type="candle",
         volume=True,
         style="charles",
-        title="BTCUSDT 1-minute Candles",
+        title=f"{symbols.symbol_slug(args.symbol).upper()} 1-minute Candles",
         ylabel="Price (USDT)",
         ylabel_lower="Volume"
     )
@@ -0,0 +1,67 @@
+import os
+
+import joblib
+import pandas as pd
+
+from fingerprint import combine_digests, file_digest, frame_digest
+from simulation import compute_atr_regime, load_market_data
+
+
+MODEL_PATH = "data/models/xgb_tp_sl_model.pkl"
+CACHE_DIR = "data/cache/probs"
+
+
+def cache_key(X_test, model_path=MODEL_PATH):
+    return combine_digests(file_digest(model_path), frame_digest(X_test))[:32]
+
+
+def load_signal_inputs(
+    X_test,
+    model_path=MODEL_PATH,
+    df=None,
+    model=None,
+    regime=None,
+    cache_dir=CACHE_DIR,
+):
+    """Test-set probabilities plus ATR regime columns, computed once per model.
+
+    Returns a frame indexed like ``X_test`` with ``prob``, ``atr_14`` and
+    ``atr_med``. Results are cached under ``cache_dir`` keyed by the model
+    file and the X_test split, so every threshold and leverage run for the
+    same model reuses one inference pass. ``df``, ``model`` and ``regime``
+    are only loaded or computed on a cache miss when not provided.
+    """
+    key = cache_key(X_test, model_path)
+    path = os.path.join(cache_dir, f"{key}.parquet")
+
+    if os.path.exists(path):
+        print("Loaded cached probabilities:", path)
+        return pd.read_parquet(path)
+
+    if model is None:
+        model = joblib.load(model_path)
+    if regime is None:
+        regime = compute_atr_regime(load_market_data() if df is None else df)
+
+    inputs = regime.loc[X_test.index, ["atr_14", "atr_med"]]
+    inputs.insert(0, "prob", model.predict_proba(X_test)[:, 1])
+
+    os.makedirs(cache_dir, exist_ok=True)
+    inputs.to_parquet(path)
+    print("Cached probabilities:", path)
+    return inputs
+
+
+def load_oos_inputs(probs_path, df=None, regime=None):
+    """Walk-forward out-of-sample probabilities plus ATR regime columns.
+
+    Same layout as load_signal_inputs, indexed by every out-of-sample row
+    written by walk_forward.py instead of the test split.
+    """
+    probs = pd.read_parquet(probs_path, columns=["prob"])
+    if regime is None:
+        regime = compute_atr_regime(load_market_data() if df is None else df)
+
+    inputs = regime.loc[probs.index, ["atr_14", "atr_med"]]
+    inputs.insert(0, "prob", probs["prob"].values)
+    return inputs
@@ -0,0 +1,251 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import log_loss, precision_score, recall_score
+
+from features import htf_warmup_bars, stored_timeframes
+from labeling import MAX_HOLD
+from storage import report_memory
+from train_test_split import add_label_args, load_labeled
+from train_xgboost import MODEL_PARAMS
+from tune_xgboost import MAX_BIN, booster_params
+
+
+CV_DIR = "data/cv"
+# Rows just after a test fold carry features computed over its candles. The
+# longest 1m lookback is the 20-bar volume window; higher-timeframe columns
+# look back further (see default_embargo).
+EMBARGO_MINUTES = 20
+
+# Arrays attached from shared memory in each worker process.
+_SHARED = {}
+
+
+def default_embargo(columns):
+    """Embargo in minutes covering the longest feature lookback of ``columns``."""
+    return max(EMBARGO_MINUTES, htf_warmup_bars(stored_timeframes(columns)))
+
+
+def fold_bounds(n, folds=5):
+    """(test_start, test_end) row positions of ``folds`` consecutive test folds."""
+    edges = np.linspace(0, n, folds + 1).astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def purged_ranges(minutes, test_start, test_end, max_hold=MAX_HOLD, embargo=EMBARGO_MINUTES):
+    """Training row ranges for the test rows ``[test_start, test_end)``, plus purged and embargoed counts.
+
+    ``minutes`` are the sorted open times in minutes. The label of a row at
+    t looks at candles (t, t + max_hold], so a training row is purged when
+    that window overlaps the test fold's rows or label windows: t within
+    ``max_hold`` minutes before the first test row or after the last one.
+    The ``embargo`` minutes after that are dropped as well. What is left is
+    at most two contiguous ranges, returned as (start, end) positions.
+    """
+    first, last = minutes[test_start], minutes[test_end - 1]
+    purge_start = int(np.searchsorted(minutes, first - max_hold, side="left"))
+    purge_end = int(np.searchsorted(minutes, last + max_hold, side="right"))
+    embargo_end = int(np.searchsorted(minutes, last + max_hold + embargo, side="right"))
+    ranges = [(start, end) for start, end in ((0, purge_start), (embargo_end, len(minutes))) if end > start]
+    purged = (test_start - purge_start) + (purge_end - test_end)
+    return ranges, purged, embargo_end - purge_end
+
+
+class _RangeIter(xgb.DataIter):
+    """Feeds row ranges of a shared matrix to QuantileDMatrix as views, without copying them."""
+
+    def __init__(self, X, y, ranges):
+        self.X, self.y, self.ranges = X, y, ranges
+        self._it = 0
+        super().__init__(release_data=True)
+
+    def next(self, input_data):
+        if self._it == len(self.ranges):
+            return False
+        start, end = self.ranges[self._it]
+        input_data(data=self.X[start:end], label=self.y[start:end])
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+
+def share_arrays(arrays):
+    """Copy ``arrays`` into shared memory once; returns the blocks and the specs workers attach with."""
+    blocks, specs = [], {}
+    for name, array in arrays.items():
+        block = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        np.ndarray(array.shape, array.dtype, buffer=block.buf)[...] = array
+        blocks.append(block)
+        specs[name] = (block.name, array.shape, array.dtype.str)
+    return blocks, specs
+
+
+def _attach(specs):
+    for name, (block_name, shape, dtype) in specs.items():
+        block = shared_memory.SharedMemory(name=block_name)
+        array = np.ndarray(shape, dtype, buffer=block.buf)
+        array.flags.writeable = False
+        _SHARED[name] = (block, array)
+
+
+def run_fold(fold, test_start, test_end, max_hold, embargo, nthread, arrays=None):
+    """Fit MODEL_PARAMS on the purged training rows of one fold and score its test rows.
+
+    Reads X, y and minutes from ``arrays``, or from the shared memory the
+    worker attached to.
+    """
+    start = time.perf_counter()
+    if arrays is None:
+        arrays = {name: array for name, (_, array) in _SHARED.items()}
+    X, y, minutes = arrays["X"], arrays["y"], arrays["minutes"]
+
+    ranges, purged, embargoed = purged_ranges(minutes, test_start, test_end, max_hold, embargo)
+    dtrain = xgb.QuantileDMatrix(_RangeIter(X, y, ranges), max_bin=MAX_BIN)
+    config = {
+        key: value
+        for key, value in MODEL_PARAMS.items()
+        if key not in ("objective", "eval_metric", "random_state", "n_estimators")
+    }
+    booster = xgb.train(booster_params(config, nthread), dtrain, num_boost_round=MODEL_PARAMS["n_estimators"])
+
+    probs = booster.inplace_predict(X[test_start:test_end])
+    preds = (probs >= 0.5).astype(int)
+    y_test = y[test_start:test_end]
+    return {
+        "fold": fold,
+        "train_rows": sum(end - begin for begin, end in ranges),
+        "purged_rows": purged,
+        "embargoed_rows": embargoed,
+        "test_rows": test_end - test_start,
+        "test_logloss": log_loss(y_test, probs, labels=[0, 1]),
+        "test_precision": precision_score(y_test, preds, pos_label=1, zero_division=0),
+        "test_recall": recall_score(y_test, preds, pos_label=1, zero_division=0),
+        "seconds": time.perf_counter() - start,
+    }, probs
+
+
+def purged_cv(data, folds=5, max_hold=MAX_HOLD, embargo=None, workers=1, n_jobs=None):
+    """Purged, embargoed k-fold cross-validation over time-ordered ``data``.
+
+    Every fold tests on one consecutive block of rows and trains on the rest
+    minus the purged and embargoed rows (see purged_ranges). With more than
+    one worker, folds run in separate processes that attach to a single
+    read-only shared-memory copy of the feature matrix; cores are split
+    between them. ``embargo`` defaults to default_embargo of the feature
+    columns. Returns the per-fold summary and the out-of-fold probabilities
+    (``prob`` and ``fold`` per row).
+    """
+    data = data.sort_index()
+    if embargo is None:
+        embargo = default_embargo(data.columns)
+    X = np.ascontiguousarray(data.drop(columns=["label"]).to_numpy(dtype=np.float32))
+    arrays = {
+        "X": X,
+        "y": data["label"].to_numpy(dtype=np.float32),
+        "minutes": data.index.as_unit("s").asi8 // 60,
+    }
+    bounds = fold_bounds(len(data), folds)
+    workers = max(1, min(workers, folds))
+    nthread = max(1, (n_jobs or os.cpu_count() or 1) // workers)
+    jobs = [(fold, start, end, max_hold, embargo, nthread) for fold, (start, end) in enumerate(bounds)]
+
+    if workers == 1:
+        results = [run_fold(*job, arrays=arrays) for job in jobs]
+    else:
+        blocks, specs = share_arrays(arrays)
+        del X, arrays
+        try:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_attach, initargs=(specs,)) as pool:
+                results = list(pool.map(run_fold, *zip(*jobs)))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+
+    summary = pd.DataFrame([row for row, _ in results])
+    summary.insert(1, "test_start", data.index[[start for start, _ in bounds]])
+    summary.insert(2, "test_end", data.index[[end - 1 for _, end in bounds]])
+    probs = pd.DataFrame(
+        {
+            "prob": np.concatenate([fold_probs for _, fold_probs in results]),
+            "fold": np.repeat(np.arange(len(bounds), dtype=np.int16), [end - start for start, end in bounds]),
+        },
+        index=data.index,
+    )
+    return summary, probs
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Purged, embargoed time-series cross-validation of the XGBoost TP/SL classifier."
+    )
+    add_label_args(parser)
+    parser.add_argument("--folds", type=int, default=5, help="Consecutive test folds.")
+    parser.add_argument(
+        "--max-hold",
+        type=int,
+        default=MAX_HOLD,
+        help="Label horizon in minutes; training rows whose label window overlaps a test fold are purged.",
+    )
+    parser.add_argument(
+        "--embargo-minutes",
+        type=int,
+        default=None,
+        help=(
+            "Extra minutes of training rows dropped after each test fold's purge window "
+            f"(default: the longest feature lookback, at least {EMBARGO_MINUTES})."
+        ),
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Folds trained at the same time in separate processes; cores are split between them.",
+    )
+    parser.add_argument("--n-jobs", type=int, default=None, help="Total XGBoost threads (default: all cores).")
+    parser.add_argument("--output-dir", default=CV_DIR, help="Where the fold summary and out-of-fold probabilities go.")
+    args = parser.parse_args()
+
+    if args.folds < 2:
+        raise ValueError("--folds must be >= 2")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
+
+    data = load_labeled(args.label_matrix, args.tp, args.sl)
+    report_memory("purged-cv", labeled=data)
+    embargo = default_embargo(data.columns) if args.embargo_minutes is None else args.embargo_minutes
+    print(f"Purge: {args.max_hold} minutes | Embargo: {embargo} minutes")
+
+    summary, probs = purged_cv(
+        data,
+        folds=args.folds,
+        max_hold=args.max_hold,
+        embargo=embargo,
+        workers=args.workers,
+        n_jobs=args.n_jobs,
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    summary.to_csv(os.path.join(args.output_dir, "folds.csv"), index=False)
+    probs_path = os.path.join(args.output_dir, "oof_probs.parquet")
+    probs.to_parquet(probs_path)
+
+    print(summary.round({"test_logloss": 4, "test_precision": 4, "test_recall": 4, "seconds": 3}).to_string(index=False))
+    print(f"\nCROSS-VALIDATION METRICS (class 1, mean ± std over {len(summary)} folds)")
+    print(f"Precision: {summary['test_precision'].mean():.4f} ± {summary['test_precision'].std():.4f}")
+    print(f"Recall:    {summary['test_recall'].mean():.4f} ± {summary['test_recall'].std():.4f}")
+    print(f"Logloss:   {summary['test_logloss'].mean():.4f} ± {summary['test_logloss'].std():.4f}")
+    print("Fold summary saved to:", os.path.join(args.output_dir, "folds.csv"))
+    print("Out-of-fold probabilities saved to:", probs_path)
+
+
+if __name__ == "__main__":
+    main()
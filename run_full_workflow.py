@@ -2,6 +2,26 @@ import argparse
 import subprocess
 import sys
 
+from dataset import raw_files
+from features import feature_files, parse_timeframes
+from inference import native_path, source_path
+from pipeline import print_report, run_pipeline, workflow_stages
+from step_cache import StepCache
+from storage import DEFAULT_PRECISION, PRECISIONS
+
+
+FEATURES_PATH = "data/features/btcusdt_features.parquet"
+LABELED_PATH = "data/labeled/btcusdt_labeled.parquet"
+SPLIT_PATHS = [
+    f"data/splits/{name}.parquet"
+    for name in ("X_train", "y_train", "X_val", "y_val", "X_test", "y_test")
+]
+MODEL_PATH = "data/models/xgb_tp_sl_model.pkl"
+TRADES_PATH = "data/results/trades.parquet"
+TRADES_LEVERAGE_PATH = "data/results/trades_leverage.parquet"
+
+SIMULATION_CODE = ["simulation.py", "kernels.py", "prob_cache.py", "labeling.py", "dataset.py", "symbols.py"]
+
 
 def run_step(step_name, command):
     print(f"\n===== {step_name} =====", flush=True)
@@ -9,6 +29,26 @@ def run_step(step_name, command):
     subprocess.run(command, check=True)
 
 
+def run_cached_step(cache, summary, step_name, command, inputs, outputs, params=None, force=False):
+    """Run a step unless an artifact with the same input/parameter fingerprint exists.
+
+    ``inputs`` should list every file the step reads, including its scripts,
+    so code or data changes invalidate the cached outputs.
+    """
+    fingerprint = cache.fingerprint(step_name, command[1:], inputs, params)
+
+    if not force:
+        status = cache.restore(fingerprint, outputs)
+        if status:
+            print(f"\n===== {step_name} ===== ({status}, fingerprint {fingerprint[:12]})", flush=True)
+            summary.append((step_name, status))
+            return
+
+    run_step(step_name, command)
+    cache.store(fingerprint, outputs)
+    summary.append((step_name, "ran"))
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Run the complete AI Trading Model workflow end-to-end."
@@ -16,7 +56,7 @@ def main():
     parser.add_argument(
         "--download-data",
         action="store_true",
-        help="Run download_data.py before feature generation.",
+        help="Run download_data.py and gaps.py before feature generation.",
     )
     parser.add_argument(
         "--tp",
@@ -48,6 +88,33 @@ def main():
         default=1.0,
         help="Fraction of capital allocated per leveraged trade (0, 1].",
     )
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=DEFAULT_PRECISION,
+        help="Float dtype for the stored feature, labeled and split files.",
+    )
+    parser.add_argument(
+        "--timeframes",
+        type=parse_timeframes,
+        default=[],
+        help="Comma-separated higher timeframes added to the features (5m, 15m, 1h).",
+    )
+    parser.add_argument(
+        "--in-process",
+        action="store_true",
+        help="Run all steps in one process, passing DataFrames and the model in memory.",
+    )
+    parser.add_argument(
+        "--persist",
+        action="store_true",
+        help="With --in-process, also write intermediate artifacts to their usual paths.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Rerun every step even when a cached artifact with a matching fingerprint exists.",
+    )
     args = parser.parse_args()
 
     if args.leverage <= 0:
@@ -58,25 +125,88 @@ def main():
         raise ValueError("--capital-fraction must be in (0, 1]")
 
     py = sys.executable
+    cache = StepCache()
+    summary = []
 
     if args.download_data:
         run_step("Download Data", [py, "download_data.py"])
+        summary.append(("Download Data", "ran"))
+        run_step("Repair Gaps", [py, "gaps.py"])
+        summary.append(("Repair Gaps", "ran"))
 
-    run_step("Feature Engineering", [py, "features.py"])
-    run_step("Labeling", [py, "labeling.py", str(args.tp)])
-    run_step("Train/Test Split", [py, "train_test_split.py"])
-    run_step("Model Training", [py, "train_xgboost.py"])
+    if args.in_process:
+        stages = workflow_stages(
+            args.tp,
+            args.prob,
+            leverage=args.leverage,
+            initial_capital=args.initial_capital,
+            capital_fraction=args.capital_fraction,
+            precision=args.precision,
+            timeframes=args.timeframes,
+        )
+        _, report = run_pipeline(stages, persist=args.persist)
+        print_report(report)
+        print("\n===== WORKFLOW COMPLETE =====")
+        return
 
-    run_step(
+    # Listed after the optional download, which may add month partitions.
+    raw_inputs = raw_files()
+
+    run_cached_step(
+        cache,
+        summary,
+        "Feature Engineering",
+        [py, "features.py", "--precision", args.precision, "--timeframes", ",".join(args.timeframes)],
+        inputs=["features.py", "kernels.py", "storage.py", "dataset.py", "symbols.py", *raw_inputs],
+        outputs=[FEATURES_PATH],
+        force=args.force,
+    )
+    run_cached_step(
+        cache,
+        summary,
+        "Labeling",
+        [py, "labeling.py", str(args.tp), "--precision", args.precision],
+        # Parts added by features.py --append belong to the feature matrix too.
+        inputs=["labeling.py", "features.py", "storage.py", "dataset.py", "symbols.py", *raw_inputs, *feature_files(FEATURES_PATH)],
+        outputs=[LABELED_PATH],
+        force=args.force,
+    )
+    run_cached_step(
+        cache,
+        summary,
+        "Train/Test Split",
+        [py, "train_test_split.py", "--precision", args.precision],
+        inputs=["train_test_split.py", "storage.py", LABELED_PATH],
+        outputs=SPLIT_PATHS,
+        force=args.force,
+    )
+    run_cached_step(
+        cache,
+        summary,
+        "Model Training",
+        [py, "train_xgboost.py"],
+        inputs=["train_xgboost.py", "model_registry.py", "inference.py", *SPLIT_PATHS],
+        outputs=[MODEL_PATH, native_path(MODEL_PATH), source_path(MODEL_PATH)],
+        force=args.force,
+    )
+
+    run_cached_step(
+        cache,
+        summary,
         "Trade Simulation (No Leverage)",
         [py, "trade_simulation.py", str(args.tp), str(args.prob)],
+        inputs=["trade_simulation.py", *SIMULATION_CODE, *raw_inputs, SPLIT_PATHS[4], MODEL_PATH],
+        outputs=[TRADES_PATH],
+        force=args.force,
     )
     run_step(
         "Backtest (No Leverage)",
-        [py, "backtest.py", "--trades-path", "data/results/trades.parquet", "--label", "No Leverage"],
+        [py, "backtest.py", "--trades-path", TRADES_PATH, "--label", "No Leverage"],
     )
 
-    run_step(
+    run_cached_step(
+        cache,
+        summary,
         "Trade Simulation (With Leverage)",
         [
             py,
@@ -87,6 +217,9 @@ def main():
             str(args.initial_capital),
             str(args.capital_fraction),
         ],
+        inputs=["trade_simulation_leverage.py", *SIMULATION_CODE, *raw_inputs, SPLIT_PATHS[4], MODEL_PATH],
+        outputs=[TRADES_LEVERAGE_PATH],
+        force=args.force,
     )
     run_step(
         "Backtest (With Leverage)",
@@ -94,7 +227,7 @@ def main():
             py,
             "backtest.py",
             "--trades-path",
-            "data/results/trades_leverage.parquet",
+            TRADES_LEVERAGE_PATH,
             "--leverage-hint",
             str(args.leverage),
             "--label",
@@ -102,6 +235,10 @@ def main():
         ],
     )
 
+    print("\n===== STEP SUMMARY =====")
+    for step_name, status in summary:
+        print(f"{step_name:<34} {status}")
+
     print("\n===== WORKFLOW COMPLETE =====")
 
 
@@ -1,14 +1,33 @@
 import argparse
+import os
+import shutil
 import subprocess
 import sys
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
 
 import pandas as pd
 
 from backtest import run_backtest
+from dataset import raw_files
+from features import feature_files, load_features
+from fingerprint import combine_digests, file_digest, params_digest
+from labeling import LABEL_MATRIX_PATH, SL_PCT, select_label
+from model_registry import ModelRegistry
+from prob_cache import load_signal_inputs
+from simulation import compute_atr_regime, load_market_data
+from sweep_store import EXCEL_PATH, STORE_PATH, SweepStore
+from train_test_split import save_splits, split_dataset
+from train_xgboost import MODEL_PARAMS, save_model, train_model
+from trade_simulation import simulate
+from trade_simulation_leverage import simulate_leveraged
 
 
 DEFAULT_TP_VALUES = [0.0016, 0.0017, 0.0018, 0.0019, 0.0020, 0.0021, 0.0022, 0.0023, 0.0024, 0.0025]
 DEFAULT_PROB_VALUES = [0.65, 0.70, 0.75]
+RUNS_DIR = "data/runs"
+FEATURES_PATH = "data/features/btcusdt_features.parquet"
 
 
 def run_cmd(command):
@@ -16,6 +35,132 @@ def run_cmd(command):
     subprocess.run(command, check=True)
 
 
+def metrics_row(mode, tp, prob, metrics):
+    return {
+        "Mode": mode,
+        "Leverage": metrics["Leverage Used"],
+        "Take Profit": tp,
+        "Probability": prob,
+        "Total trades": metrics["Total trades"],
+        "Win rate": metrics["Win rate"],
+        "Profit factor": metrics["Profit factor"],
+        "Expectancy": metrics["Expectancy"],
+        "Final equity": metrics["Final Equity"],
+        "Max drawdown": metrics["Max drawdown"],
+    }
+
+
+def new_run_root():
+    """Unique run directory; the random suffix keeps sweeps started in the same second apart."""
+    return os.path.join(RUNS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}")
+
+
+def tp_run_dir(run_root, tp):
+    return os.path.join(run_root, f"tp_{tp:g}")
+
+
+_shared_data = {}
+
+
+def load_shared_data():
+    """Load market data, ATR regime, features and label matrix once per process."""
+    if not _shared_data:
+        df = load_market_data()
+        _shared_data["df"] = df
+        _shared_data["regime"] = compute_atr_regime(df)
+        _shared_data["X"] = load_features(FEATURES_PATH)
+        _shared_data["matrix"] = pd.read_parquet(LABEL_MATRIX_PATH)
+    return _shared_data
+
+
+def sweep_data_digest():
+    return combine_digests(*map(file_digest, raw_files()), *map(file_digest, feature_files(FEATURES_PATH)))
+
+
+def result_key(data_digest, mode, leverage, tp, prob):
+    return params_digest({
+        "data": data_digest,
+        "model": MODEL_PARAMS,
+        "sl_pct": SL_PCT,
+        "mode": mode,
+        "leverage": leverage,
+        "tp": tp,
+        "prob": prob,
+    })
+
+
+def run_tp_branch(
+    tp,
+    prob_values,
+    leverage,
+    run_dir,
+    store_path=STORE_PATH,
+    data_digest=None,
+    n_jobs=-1,
+    verbose=True,
+    keep_artifacts=False,
+):
+    """Split, train and simulate one TP value with artifacts under ``run_dir``.
+
+    Each (mode, prob) result row is appended to the sweep store as soon as
+    it finishes. Once every row is stored, ``run_dir`` is removed unless
+    ``keep_artifacts``; a failed branch keeps it. Returns the rows produced
+    by this branch.
+    """
+    store = SweepStore(store_path)
+    shared = load_shared_data()
+    df = shared["df"]
+
+    print(f"\n=== Running full pipeline for TP={tp} ({run_dir}) ===", flush=True)
+
+    splits = split_dataset(select_label(shared["X"], shared["matrix"], tp), verbose=verbose)
+    save_splits(splits, os.path.join(run_dir, "splits"))
+
+    model_path = os.path.join(run_dir, "models", "xgb_tp_sl_model.pkl")
+    model = train_model(splits, n_jobs=n_jobs, verbose=verbose, registry=ModelRegistry())
+    save_model(model, model_path)
+
+    X_test = splits["X_test"]
+    inputs = load_signal_inputs(X_test, model_path=model_path, model=model, regime=shared["regime"])
+    probs = inputs["prob"].values
+
+    rows = []
+    for prob in prob_values:
+        print(f"\n--- Non-leverage simulation: TP={tp}, Prob={prob} ---")
+        trades = simulate(df, X_test, probs, tp, prob, regime=inputs)
+
+        metrics = run_backtest(
+            tp,
+            prob,
+            trades=trades,
+            leverage_hint=1.0,
+            print_results=True,
+            label="No Leverage",
+        )
+        rows.append(metrics_row("No Leverage", tp, prob, metrics))
+        store.append(result_key(data_digest, "No Leverage", 1.0, tp, prob), rows[-1], data_digest)
+
+        print(f"\n--- Leveraged simulation: TP={tp}, Prob={prob}, Leverage={leverage} ---")
+        trades_leverage = simulate_leveraged(
+            df, X_test, probs, tp, prob, leverage=leverage, regime=inputs
+        )
+
+        metrics_leverage = run_backtest(
+            tp,
+            prob,
+            trades=trades_leverage,
+            leverage_hint=leverage,
+            print_results=True,
+            label=f"With Leverage ({leverage}x)",
+        )
+        rows.append(metrics_row("With Leverage", tp, prob, metrics_leverage))
+        store.append(result_key(data_digest, "With Leverage", leverage, tp, prob), rows[-1], data_digest)
+
+    if not keep_artifacts:
+        shutil.rmtree(run_dir, ignore_errors=True)
+    return rows
+
+
 def parse_float_csv(value):
     return [float(x.strip()) for x in value.split(",") if x.strip()]
 
@@ -40,98 +185,105 @@ def main():
         default=3.0,
         help="Leverage used for leveraged simulation.",
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of TP branches run in parallel processes.",
+    )
+    parser.add_argument(
+        "--keep-runs",
+        action="store_true",
+        help="Keep each branch's splits and model under data/runs/ after its results are stored.",
+    )
+    parser.add_argument(
+        "--store-path",
+        default=STORE_PATH,
+        help="SQLite results store. Finished combinations are appended immediately and skipped on rerun.",
+    )
     parser.add_argument(
         "--excel-path",
-        default="tpandprobanalysis.xlsx",
-        help="Output Excel file path.",
+        nargs="?",
+        const=EXCEL_PATH,
+        default=None,
+        help=(
+            f"Export the full results store to this Excel file (default: {EXCEL_PATH}). "
+            "Rows of an existing workbook the store did not write are imported first."
+        ),
+    )
+    parser.add_argument(
+        "--import-excel",
+        default=None,
+        help="Import the rows of an older sweep workbook (e.g. tpandprobanalysis.xlsx) into the store.",
     )
     args = parser.parse_args()
 
     if args.leverage <= 0:
         raise ValueError("--leverage must be > 0")
+    if args.workers < 1:
+        raise ValueError("--workers must be >= 1")
 
     py = sys.executable
-    excel_path = args.excel_path
-
-    try:
-        results_df = pd.read_excel(excel_path)
-    except FileNotFoundError:
-        results_df = pd.DataFrame(columns=[
-            "Mode",
-            "Leverage",
-            "Take Profit",
-            "Probability",
-            "Total trades",
-            "Win rate",
-            "Profit factor",
-            "Expectancy",
-            "Final equity",
-            "Max drawdown",
-        ])
+    store = SweepStore(args.store_path)
+    if args.import_excel:
+        imported = store.import_excel(args.import_excel)
+        print(f"Imported {imported} new rows from: {args.import_excel}")
+    data_digest = sweep_data_digest()
+
+    # Skip (tp, prob) combinations whose rows are already in the store.
+    pending = {}
+    for tp in args.tp_values:
+        keys = {
+            prob: [
+                result_key(data_digest, "No Leverage", 1.0, tp, prob),
+                result_key(data_digest, "With Leverage", args.leverage, tp, prob),
+            ]
+            for prob in args.prob_values
+        }
+        done = store.existing_keys(key for prob_keys in keys.values() for key in prob_keys)
+        prob_values = [prob for prob, prob_keys in keys.items() if not done.issuperset(prob_keys)]
+        if prob_values:
+            pending[tp] = prob_values
+        else:
+            print(f"TP={tp}: all combinations already in {args.store_path}, skipping")
 
     rows = []
 
-    for tp in args.tp_values:
-        print(f"\n=== Running full pipeline for TP={tp} ===")
-
-        run_cmd([py, "labeling.py", str(tp)])
-        run_cmd([py, "train_test_split.py"])
-        run_cmd([py, "train_xgboost.py"])
-
-        for prob in args.prob_values:
-            print(f"\n--- Non-leverage simulation: TP={tp}, Prob={prob} ---")
-            run_cmd([py, "trade_simulation.py", str(tp), str(prob)])
-
-            metrics = run_backtest(
-                tp,
-                prob,
-                trades_path="data/results/trades.parquet",
-                leverage_hint=1.0,
-                print_results=True,
-                label="No Leverage",
-            )
-
-            rows.append({
-                "Mode": "No Leverage",
-                "Leverage": metrics["Leverage Used"],
-                "Take Profit": tp,
-                "Probability": prob,
-                "Total trades": metrics["Total trades"],
-                "Win rate": metrics["Win rate"],
-                "Profit factor": metrics["Profit factor"],
-                "Expectancy": metrics["Expectancy"],
-                "Final equity": metrics["Final Equity"],
-                "Max drawdown": metrics["Max drawdown"],
-            })
-
-            print(f"\n--- Leveraged simulation: TP={tp}, Prob={prob}, Leverage={args.leverage} ---")
-            run_cmd([py, "trade_simulation_leverage.py", str(tp), str(prob), str(args.leverage)])
-
-            metrics_leverage = run_backtest(
-                tp,
-                prob,
-                trades_path="data/results/trades_leverage.parquet",
-                leverage_hint=args.leverage,
-                print_results=True,
-                label=f"With Leverage ({args.leverage}x)",
-            )
-
-            rows.append({
-                "Mode": "With Leverage",
-                "Leverage": metrics_leverage["Leverage Used"],
-                "Take Profit": tp,
-                "Probability": prob,
-                "Total trades": metrics_leverage["Total trades"],
-                "Win rate": metrics_leverage["Win rate"],
-                "Profit factor": metrics_leverage["Profit factor"],
-                "Expectancy": metrics_leverage["Expectancy"],
-                "Final equity": metrics_leverage["Final Equity"],
-                "Max drawdown": metrics_leverage["Max drawdown"],
-            })
-
-    final_df = pd.concat([results_df, pd.DataFrame(rows)], ignore_index=True)
-    final_df.to_excel(excel_path, index=False)
-    print(f"\nParameter sweep complete. Results saved to: {excel_path}")
+    if pending:
+        print("\n=== Labeling TP grid ===")
+        tp_grid = ",".join(str(tp) for tp in pending)
+        run_cmd([py, "labeling.py", "--tp-grid", tp_grid, "--matrix-path", LABEL_MATRIX_PATH])
+
+        run_root = new_run_root()
+        workers = max(1, min(args.workers, len(pending)))
+        print(f"\n=== Sweeping {len(pending)} TP values with {workers} worker(s), artifacts in {run_root} ===")
+
+        branch_args = [
+            (tp, prob_values, args.leverage, tp_run_dir(run_root, tp), args.store_path, data_digest)
+            for tp, prob_values in pending.items()
+        ]
+
+        if workers == 1:
+            for branch in branch_args:
+                rows.extend(run_tp_branch(*branch, keep_artifacts=args.keep_runs))
+        else:
+            # Split cores between workers so concurrent XGBoost fits don't oversubscribe.
+            n_jobs = max(1, (os.cpu_count() or 1) // workers)
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = [pool.submit(run_tp_branch, *branch, n_jobs, False, args.keep_runs) for branch in branch_args]
+                for future in futures:
+                    rows.extend(future.result())
+
+        if not args.keep_runs and os.path.isdir(run_root) and not os.listdir(run_root):
+            os.rmdir(run_root)
+
+    print(f"\nParameter sweep complete. {len(rows)} new rows stored in: {args.store_path}")
+
+    if args.excel_path:
+        exported, imported = store.export_excel(args.excel_path)
+        if imported:
+            print(f"Imported {imported} rows already in {args.excel_path} into the store first")
+        print(f"Exported {exported} rows to: {args.excel_path}")
 
 
 if __name__ == "__main__":
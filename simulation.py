@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+import dataset
+import kernels
+import symbols
+from labeling import MAX_HOLD, SL_PCT, contiguous_windows, forward_window
+
+
+def resolve_exit_positions(high, low, close, entries, tp_pct, sl_pct=SL_PCT, max_hold=MAX_HOLD):
+    """Resolve TP/SL/timeout exits for every entry position at once.
+
+    Scans the ``max_hold`` candles after each entry: the first candle whose
+    high reaches TP or whose low reaches SL closes the trade (TP is checked
+    first within a candle). Otherwise the trade times out at the close of the
+    last available candle. Entries on the final candle have no future and
+    are dropped, so the returned arrays only cover entries that traded.
+    """
+    close = np.asarray(close, dtype=np.float64)
+    entries = np.asarray(entries, dtype=np.int64)
+    n = len(close)
+
+    entries = entries[entries < n - 1]
+
+    entry_price = close[entries]
+    tp_price = entry_price * (1 + tp_pct)
+    sl_price = entry_price * (1 - sl_pct)
+
+    tp_hit = forward_window(high, max_hold)[entries] >= tp_price[:, None]
+    any_hit = tp_hit | (forward_window(low, max_hold)[entries] <= sl_price[:, None])
+
+    first_hit = any_hit.argmax(axis=1)
+    hit = any_hit.any(axis=1)
+    is_tp = hit & tp_hit[np.arange(len(entries)), first_hit]
+    is_sl = hit & ~is_tp
+
+    timeout_pos = np.minimum(entries + max_hold, n - 1)
+    exit_pos = np.where(hit, entries + 1 + first_hit, timeout_pos)
+    exit_price = np.where(is_tp, tp_price, np.where(is_sl, sl_price, close[timeout_pos]))
+    result = np.where(is_tp, "tp", np.where(is_sl, "sl", "timeout"))
+
+    return entries, exit_pos, entry_price, exit_price, result
+
+
+def resolve_exits(df, entry_times, tp_pct, sl_pct=SL_PCT, max_hold=MAX_HOLD):
+    """Resolve exits for ``entry_times`` against the OHLC frame ``df``.
+
+    Returns one row per trade with entry/exit time, entry/exit price and
+    result ("tp", "sl" or "timeout"), in entry order. Entries whose forward
+    window spans missing candles are not traded.
+    """
+    positions = df.index.get_indexer(entry_times)
+    if (positions < 0).any():
+        missing = entry_times[positions < 0]
+        raise KeyError(f"{len(missing)} entry times not found in market data, e.g. {missing[0]}")
+    positions = positions[contiguous_windows(df.index, max_hold)[positions]]
+
+    entries, exit_pos, entry_price, exit_price, result = resolve_exit_positions(
+        df["high"].values,
+        df["low"].values,
+        df["close"].values,
+        positions,
+        tp_pct,
+        sl_pct=sl_pct,
+        max_hold=max_hold,
+    )
+
+    return pd.DataFrame({
+        "entry_time": df.index[entries],
+        "exit_time": df.index[exit_pos],
+        "entry_price": entry_price,
+        "exit_price": exit_price,
+        "result": result,
+    })
+
+
+def load_market_data(symbol=symbols.DEFAULT_SYMBOL, start=None, end=None):
+    return dataset.load_ohlcv(symbol, start, end)
+
+
+def compute_atr_regime(df):
+    """ATR(14) and its rolling 100-candle median (volatility regime filter)."""
+    atr_14 = kernels.atr(df["high"].values, df["low"].values, df["close"].values, (14,))[14]
+
+    regime = pd.DataFrame(index=df.index)
+    regime["atr_14"] = atr_14
+    regime["atr_med"] = regime["atr_14"].rolling(100).median()
+    return regime
+
+
+def entry_signals(index, probs, regime, prob_threshold):
+    """Long entries where the model is confident and volatility is elevated."""
+    signals = pd.DataFrame(index=index)
+    signals["prob"] = probs
+    signals["atr"] = regime.loc[signals.index, "atr_14"]
+    signals["atr_med"] = regime.loc[signals.index, "atr_med"]
+
+    signals["enter"] = (
+        (signals["prob"] > prob_threshold)
+        & (signals["atr"] > 1.2 * signals["atr_med"])
+    )
+    return signals
@@ -0,0 +1,123 @@
+import json
+import os
+import shutil
+
+from fingerprint import file_digest, params_digest
+
+
+CACHE_DIR = "data/cache/steps"
+MAX_ENTRIES = 30
+MAX_BYTES = 2 * 2**30
+
+
+class StepCache:
+    """Content-addressed cache of pipeline step outputs.
+
+    A step's fingerprint hashes its name, command, parameters and the
+    content of its input files (including the scripts it runs). After a
+    successful run the outputs are copied under ``<cache_dir>/<fingerprint>/``
+    so a later run with the same fingerprint can skip the step, restoring
+    the artifacts if they were overwritten in the meantime. The manifest's
+    mtime is the entry's last use: a hit touches it, and after each store the
+    least recently used entries are evicted until at most ``max_entries``
+    remain within ``max_bytes``.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._digests = {}
+
+    def _digest(self, path):
+        # Inputs such as the raw parquet are shared by several steps; hash each once.
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+        if key not in self._digests:
+            self._digests[key] = file_digest(path)
+        return self._digests[key]
+
+    def fingerprint(self, step_name, command, inputs=(), params=None):
+        missing = [path for path in inputs if not os.path.exists(path)]
+        if missing:
+            return None
+        return params_digest({
+            "step": step_name,
+            "command": list(command),
+            "params": params or {},
+            "inputs": {path: self._digest(path) for path in inputs},
+        })[:32]
+
+    def _entry_dir(self, fingerprint):
+        return os.path.join(self.cache_dir, fingerprint)
+
+    def _manifest_path(self, fingerprint):
+        return os.path.join(self._entry_dir(fingerprint), "manifest.json")
+
+    def restore(self, fingerprint, outputs):
+        """Return "cached" or "restored" on a hit, None on a miss."""
+        if fingerprint is None or not os.path.exists(self._manifest_path(fingerprint)):
+            return None
+
+        with open(self._manifest_path(fingerprint)) as f:
+            manifest = json.load(f)
+        if sorted(manifest["outputs"]) != sorted(outputs):
+            return None
+
+        status = "cached"
+        for path, entry in manifest["outputs"].items():
+            if os.path.exists(path) and self._digest(path) == entry["digest"]:
+                continue
+            blob = os.path.join(self._entry_dir(fingerprint), entry["blob"])
+            if not os.path.exists(blob):
+                return None
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            shutil.copy2(blob, path)
+            status = "restored"
+        os.utime(self._manifest_path(fingerprint))
+        return status
+
+    def store(self, fingerprint, outputs):
+        if fingerprint is None:
+            return
+
+        entry_dir = self._entry_dir(fingerprint)
+        os.makedirs(entry_dir, exist_ok=True)
+
+        manifest = {"outputs": {}}
+        for i, path in enumerate(outputs):
+            blob = f"{i:02d}_{os.path.basename(path)}"
+            shutil.copy2(path, os.path.join(entry_dir, blob))
+            manifest["outputs"][path] = {"digest": self._digest(path), "blob": blob}
+
+        with open(self._manifest_path(fingerprint), "w") as f:
+            json.dump(manifest, f, indent=2)
+        self.evict()
+
+    def entries(self):
+        """(fingerprint, size, mtime) of cached steps, least recently used first."""
+        if not os.path.isdir(self.cache_dir):
+            return []
+        entries = []
+        for name in os.listdir(self.cache_dir):
+            entry_dir = self._entry_dir(name)
+            try:
+                mtime = os.stat(self._manifest_path(name)).st_mtime_ns
+                size = sum(entry.stat().st_size for entry in os.scandir(entry_dir))
+            except FileNotFoundError:
+                continue
+            entries.append((name, size, mtime))
+        return sorted(entries, key=lambda entry: entry[2])
+
+    def evict(self):
+        """Drop least recently used entries beyond the entry and size budgets; returns the fingerprints dropped."""
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        dropped = []
+        # The newest entry is always kept, even when it alone exceeds max_bytes.
+        while len(entries) > 1 and (len(entries) > self.max_entries or total > self.max_bytes):
+            fingerprint, size, _ = entries.pop(0)
+            shutil.rmtree(self._entry_dir(fingerprint), ignore_errors=True)
+            total -= size
+            dropped.append(fingerprint)
+        return dropped
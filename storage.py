@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+
+
+PRECISIONS = ("float32", "float64")
+
+# XGBoost converts features to float32 internally, so float32 storage does not
+# change what the model sees while halving memory and disk.
+DEFAULT_PRECISION = "float32"
+
+INT8_COLUMNS = ("vol_spike", "label")
+
+
+def apply_precision(df, precision=DEFAULT_PRECISION):
+    """Cast float columns to ``precision`` and flag/label columns to int8."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"precision must be one of {PRECISIONS}, got {precision!r}")
+
+    if isinstance(df, pd.Series):
+        return apply_precision(df.to_frame(), precision)[df.name]
+
+    dtypes = {}
+    for column, dtype in df.dtypes.items():
+        if column in INT8_COLUMNS or str(column).startswith("label_"):
+            dtypes[column] = np.int8
+        elif pd.api.types.is_float_dtype(dtype):
+            dtypes[column] = precision
+    return df.astype(dtypes)
+
+
+def nbytes(obj):
+    if isinstance(obj, (pd.DataFrame, pd.Series)):
+        usage = obj.memory_usage(deep=True)
+        return int(usage.sum()) if isinstance(obj, pd.DataFrame) else int(usage)
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, dict):
+        return sum(nbytes(value) for value in obj.values())
+    return 0
+
+
+def report_memory(stage, **objects):
+    """Print the in-memory footprint of the frames a stage holds at once."""
+    sizes = {name: nbytes(obj) for name, obj in objects.items()}
+    parts = ", ".join(f"{name}={size / 1e6:.1f} MB" for name, size in sizes.items())
+    print(f"Memory [{stage}]: {parts}, total={sum(sizes.values()) / 1e6:.1f} MB")
+    return sizes
@@ -0,0 +1,149 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+
+from fingerprint import file_digest, params_digest
+
+
+STORE_PATH = "data/results/sweep_results.sqlite"
+EXCEL_PATH = "data/results/sweep_results.xlsx"
+
+# Display column -> SQL column, in the order results are reported.
+RESULT_COLUMNS = {
+    "Mode": "mode",
+    "Leverage": "leverage",
+    "Take Profit": "take_profit",
+    "Probability": "probability",
+    "Total trades": "total_trades",
+    "Win rate": "win_rate",
+    "Profit factor": "profit_factor",
+    "Expectancy": "expectancy",
+    "Final equity": "final_equity",
+    "Max drawdown": "max_drawdown",
+}
+
+
+class SweepStore:
+    """Append-only SQLite store of sweep result rows keyed by run fingerprint.
+
+    Every row is committed as soon as it is appended, so an interrupted
+    sweep keeps its finished combinations and can skip them on restart.
+    """
+
+    def __init__(self, path=STORE_PATH):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            columns = ", ".join(f"{name} NUMERIC" for name in RESULT_COLUMNS.values())
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, created_at TEXT, data_digest TEXT, "
+                f"{columns})"
+            )
+            # Digest of each workbook this store last wrote, to tell its own exports from foreign workbooks.
+            conn.execute("CREATE TABLE IF NOT EXISTS exports (path TEXT PRIMARY KEY, digest TEXT)")
+
+    @contextmanager
+    def _connect(self):
+        # Parallel sweep workers append concurrently; wait for the write lock.
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def existing_keys(self, keys):
+        keys = list(keys)
+        if not keys:
+            return set()
+        with self._connect() as conn:
+            placeholders = ", ".join("?" for _ in keys)
+            found = conn.execute(f"SELECT key FROM results WHERE key IN ({placeholders})", keys)
+            return {row[0] for row in found}
+
+    def append(self, key, row, data_digest=None):
+        names = ["key", "created_at", "data_digest", *RESULT_COLUMNS.values()]
+        values = [
+            key,
+            datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            data_digest,
+            *(row[column] for column in RESULT_COLUMNS),
+        ]
+        with self._connect() as conn:
+            conn.execute(
+                f"INSERT OR REPLACE INTO results ({', '.join(names)}) "
+                f"VALUES ({', '.join('?' for _ in names)})",
+                values,
+            )
+
+    def to_frame(self):
+        with self._connect() as conn:
+            df = pd.read_sql_query("SELECT * FROM results ORDER BY created_at, rowid", conn)
+        return df.rename(columns={sql: display for display, sql in RESULT_COLUMNS.items()})
+
+    def import_excel(self, excel_path):
+        """Add the rows of a workbook written outside the store (e.g. an older sweep's).
+
+        Rows are keyed by their values, and rows the store already holds are
+        skipped, so importing a workbook twice (or one of the store's own
+        exports) adds nothing. Returns the number of new rows.
+        """
+        df = pd.read_excel(excel_path)
+        missing = [column for column in RESULT_COLUMNS if column not in df.columns]
+        if missing:
+            raise ValueError(f"{excel_path} is not a sweep workbook (missing columns: {missing})")
+
+        stored = {_values_digest(values) for values in self.to_frame()[list(RESULT_COLUMNS)].values.tolist()}
+        created_at = datetime.fromtimestamp(os.path.getmtime(excel_path), timezone.utc).isoformat(timespec="seconds")
+        rows = []
+        for values in df[list(RESULT_COLUMNS)].values.tolist():
+            digest = _values_digest(values)
+            if digest not in stored:
+                stored.add(digest)
+                rows.append(["excel:" + digest[:32], created_at, None, *_normalize(values)])
+
+        names = ["key", "created_at", "data_digest", *RESULT_COLUMNS.values()]
+        with self._connect() as conn:
+            conn.executemany(
+                f"INSERT OR IGNORE INTO results ({', '.join(names)}) VALUES ({', '.join('?' for _ in names)})",
+                rows,
+            )
+        return len(rows)
+
+    def export_excel(self, excel_path=EXCEL_PATH):
+        """Write every stored row to ``excel_path``; returns (rows exported, rows imported first).
+
+        A workbook already at ``excel_path`` that this store did not write
+        (or that was edited since) is imported before it is replaced, so
+        its rows are never lost.
+        """
+        key = os.path.abspath(excel_path)
+        imported = 0
+        if os.path.exists(excel_path):
+            with self._connect() as conn:
+                written = conn.execute("SELECT digest FROM exports WHERE path = ?", (key,)).fetchone()
+            if written is None or written[0] != file_digest(excel_path):
+                imported = self.import_excel(excel_path)
+
+        df = self.to_frame()[list(RESULT_COLUMNS)]
+        os.makedirs(os.path.dirname(excel_path) or ".", exist_ok=True)
+        df.to_excel(excel_path, index=False)
+        with self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO exports (path, digest) VALUES (?, ?)", (key, file_digest(excel_path)))
+        return len(df), imported
+
+
+def _normalize(values):
+    """Workbook/SQLite row values as str (mode), float or None, so both sides compare equal."""
+    return [
+        value if isinstance(value, str) else None if pd.isna(value) else float(value)
+        for value in values
+    ]
+
+
+def _values_digest(values):
+    return params_digest(_normalize(values))
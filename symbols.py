@@ -0,0 +1,58 @@
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_SYMBOL = "BTC/USDT"
+
+
+def symbol_slug(symbol):
+    """File-name form of a ccxt symbol: ``BTC/USDT`` and ``BTC/USDT:USDT`` -> ``btcusdt``."""
+    return symbol.split(":")[0].replace("/", "").lower()
+
+
+def features_path(symbol=DEFAULT_SYMBOL):
+    return f"data/features/{symbol_slug(symbol)}_features.parquet"
+
+
+def labeled_path(symbol=DEFAULT_SYMBOL):
+    return f"data/labeled/{symbol_slug(symbol)}_labeled.parquet"
+
+
+def label_matrix_path(symbol=DEFAULT_SYMBOL):
+    return f"data/labeled/{symbol_slug(symbol)}_label_matrix.parquet"
+
+
+def parse_symbols(value):
+    return [s.strip().upper() for s in value.split(",") if s.strip()]
+
+
+def run_per_symbol(func, symbols, workers=1, **kwargs):
+    """Call ``func(symbol, **kwargs)`` for every symbol, in a process pool when workers > 1.
+
+    Results are returned in ``symbols`` order.
+    """
+    workers = max(1, min(workers, len(symbols)))
+    if workers == 1:
+        return [func(symbol, **kwargs) for symbol in symbols]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(func, symbol, **kwargs) for symbol in symbols]
+        return [future.result() for future in futures]
+
+
+def write_manifest(path, entries):
+    """Merge per-symbol output entries into a stage's JSON manifest.
+
+    Entries are keyed by output path, so rerunning a subset of symbols keeps
+    the entries of the others.
+    """
+    merged = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            merged = {entry["path"]: entry for entry in json.load(f)["symbols"]}
+    merged.update((entry["path"], entry) for entry in entries)
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"symbols": sorted(merged.values(), key=lambda e: e["path"])}, f, indent=2, default=str)
+    return len(merged)
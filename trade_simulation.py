@@ -1,132 +1,110 @@
+import argparse
 import os
-import sys
 
-import joblib
 import pandas as pd
 
+from prob_cache import load_oos_inputs, load_signal_inputs
+from simulation import compute_atr_regime, entry_signals, load_market_data, resolve_exits
+from storage import report_memory
 
-# Load market data
-df = pd.read_parquet("data/raw/btcusdt_1m.parquet")
-df = df.set_index("timestamp").sort_index()
 
-# Load test features
-X_test = pd.read_parquet("data/splits/X_test.parquet")
+SL_PCT = 0.0008
+MAX_HOLD = 5
+FEE_PCT = 0.0004  # 0.04% per side (Binance-like)
 
-# Load trained model
-model = joblib.load("data/models/xgb_tp_sl_model.pkl")
 
-high_low = df["high"] - df["low"]
-high_close = (df["high"] - df["close"].shift()).abs()
-low_close = (df["low"] - df["close"].shift()).abs()
+def simulate(df, X_test, probs, tp_pct=0.0023, prob_threshold=0.65, regime=None):
+    """Simulate non-leveraged trades on preloaded data and return the trade log.
 
-true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-df["atr_14"] = true_range.rolling(14).mean()
+    ``df`` is the OHLC frame indexed by timestamp, ``probs`` the model
+    probabilities for ``X_test`` rows. Pass ``regime`` from
+    compute_atr_regime(df) to reuse it across runs.
+    """
+    if regime is None:
+        regime = compute_atr_regime(df)
 
-# Rolling median ATR (volatility regime filter)
-df["atr_med"] = df["atr_14"].rolling(100).median()
+    signals = entry_signals(X_test.index, probs, regime, prob_threshold)
+    exits = resolve_exits(df, signals[signals["enter"]].index, tp_pct, SL_PCT, MAX_HOLD)
 
-probs = model.predict_proba(X_test)[:, 1]
+    if exits.empty:
+        return pd.DataFrame()
 
-signals = pd.DataFrame(index=X_test.index)
-signals["prob"] = probs
+    trades_df = exits
+    trades_df["gross_return"] = (
+        (trades_df["exit_price"] - trades_df["entry_price"]) / trades_df["entry_price"]
+    )
+    fees = 2 * FEE_PCT
+    trades_df["net_return"] = trades_df["gross_return"] - fees
+    trades_df["pnl"] = trades_df["net_return"]
 
-# Command-line arguments
-TP_PCT = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0023
-PROB_THRESHOLD = float(sys.argv[2]) if len(sys.argv) > 2 else 0.65
+    trades_df["equity"] = (1 + trades_df["net_return"]).cumprod()
+    trades_df["peak"] = trades_df["equity"].cummax()
+    trades_df["drawdown"] = trades_df["equity"] / trades_df["peak"] - 1
+    return trades_df
 
-signals["atr"] = df.loc[signals.index, "atr_14"]
-signals["atr_med"] = df.loc[signals.index, "atr_med"]
 
-signals["enter"] = (
-    (signals["prob"] > PROB_THRESHOLD)
-    & (signals["atr"] > 1.2 * signals["atr_med"])
-)
+def main():
+    # Command-line arguments
+    parser = argparse.ArgumentParser(description="Non-leverage trade simulation on the test split.")
+    parser.add_argument("tp_pct", nargs="?", type=float, default=0.0023, help="Take-profit percentage.")
+    parser.add_argument("prob_threshold", nargs="?", type=float, default=0.65, help="Minimum model probability.")
+    parser.add_argument(
+        "--probs",
+        default=None,
+        help="Out-of-sample probabilities from walk_forward.py, simulated instead of the test split.",
+    )
+    args = parser.parse_args()
+    tp_pct, prob_threshold = args.tp_pct, args.prob_threshold
 
-SL_PCT = 0.0008
-MAX_HOLD = 5
-FEE_PCT = 0.0004  # 0.04% per side (Binance-like)
+    # Load market data
+    df = load_market_data()
 
-trades = []
-
-for entry_time in signals[signals["enter"]].index:
-    entry_price = df.loc[entry_time, "close"]
-    tp_price = entry_price * (1 + TP_PCT)
-    sl_price = entry_price * (1 - SL_PCT)
-
-    future = df.loc[entry_time:].iloc[1 : MAX_HOLD + 1]
-    if future.empty:
-        continue
-
-    exit_price = None
-    exit_time = None
-    result = "timeout"
-
-    for ts, row in future.iterrows():
-        if row["high"] >= tp_price:
-            exit_price = tp_price
-            exit_time = ts
-            result = "tp"
-            break
-        if row["low"] <= sl_price:
-            exit_price = sl_price
-            exit_time = ts
-            result = "sl"
-            break
-
-    if exit_price is None:
-        exit_price = future.iloc[-1]["close"]
-        exit_time = future.index[-1]
-
-    gross_ret = (exit_price - entry_price) / entry_price
-    fees = 2 * FEE_PCT
-    net_ret = gross_ret - fees
+    if args.probs:
+        # Walk-forward probabilities cover every out-of-sample row, not just the test split
+        inputs = load_oos_inputs(args.probs, df=df)
+        X_test = pd.DataFrame(index=inputs.index)
+    else:
+        # Load test features
+        X_test = pd.read_parquet("data/splits/X_test.parquet")
 
-    trades.append({
-        "entry_time": entry_time,
-        "exit_time": exit_time,
-        "entry_price": entry_price,
-        "exit_price": exit_price,
-        "result": result,
-        "gross_return": gross_ret,
-        "net_return": net_ret,
-        "pnl": net_ret,
-    })
+        # Model probabilities and ATR regime, cached per model and test split
+        inputs = load_signal_inputs(X_test, df=df)
+    report_memory("simulation", raw=df, X_test=X_test, signal_inputs=inputs)
 
-trades_df = pd.DataFrame(trades)
+    trades_df = simulate(df, X_test, inputs["prob"].values, tp_pct, prob_threshold, regime=inputs)
 
-print("Total trades:", len(trades_df))
+    print("Total trades:", len(trades_df))
 
-os.makedirs("data/results", exist_ok=True)
+    os.makedirs("data/results", exist_ok=True)
 
-if trades_df.empty:
-    print("No trades executed")
+    if trades_df.empty:
+        print("No trades executed")
 
-    avg_return = 0.0
-    win_rate = 0.0
-    final_equity = 1.0
-    max_drawdown = 0.0
+        avg_return = 0.0
+        win_rate = 0.0
+        final_equity = 1.0
+        max_drawdown = 0.0
 
-    print("\nAverage net return:", avg_return)
-    print("Win rate:", win_rate)
-    print("\nFinal equity:", final_equity)
-    print("Max drawdown:", max_drawdown)
+        print("\nAverage net return:", avg_return)
+        print("Win rate:", win_rate)
+        print("\nFinal equity:", final_equity)
+        print("Max drawdown:", max_drawdown)
 
-    trades_df.to_parquet("data/results/trades.parquet")
-    print("Trades saved")
-    sys.exit(0)
+        trades_df.to_parquet("data/results/trades.parquet")
+        print("Trades saved")
+        return
 
-print("\nAverage net return:", trades_df["net_return"].mean())
-print("Win rate:", (trades_df["net_return"] > 0).mean())
+    print("\nAverage net return:", trades_df["net_return"].mean())
+    print("Win rate:", (trades_df["net_return"] > 0).mean())
 
-trades_df["equity"] = (1 + trades_df["net_return"]).cumprod()
+    print("\nFinal equity:", trades_df["equity"].iloc[-1])
 
-print("\nFinal equity:", trades_df["equity"].iloc[-1])
+    print("Max drawdown:", trades_df["drawdown"].min())
 
-trades_df["peak"] = trades_df["equity"].cummax()
-trades_df["drawdown"] = trades_df["equity"] / trades_df["peak"] - 1
+    trades_df.to_parquet("data/results/trades.parquet")
 
-print("Max drawdown:", trades_df["drawdown"].min())
+    print("Trades saved")
 
-trades_df.to_parquet("data/results/trades.parquet")
 
-print("Trades saved")
+if __name__ == "__main__":
+    main()
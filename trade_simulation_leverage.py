@@ -1,176 +1,194 @@
 import pandas as pd
-import joblib
-import sys
+import argparse
 import os
 
+from prob_cache import load_oos_inputs, load_signal_inputs
+from simulation import compute_atr_regime, entry_signals, load_market_data, resolve_exits
+from storage import report_memory
 
-# Load market data
-df = pd.read_parquet("data/raw/btcusdt_1m.parquet")
-df = df.set_index("timestamp").sort_index()
-
-# Load test features
-X_test = pd.read_parquet("data/splits/X_test.parquet")
-
-# Load trained model
-model = joblib.load("data/models/xgb_tp_sl_model.pkl")
-
-high_low = df["high"] - df["low"]
-high_close = (df["high"] - df["close"].shift()).abs()
-low_close = (df["low"] - df["close"].shift()).abs()
-
-true_range = pd.concat([high_low, high_close, low_close], axis=1).max(axis=1)
-df["atr_14"] = true_range.rolling(14).mean()
-
-# Rolling median ATR (volatility regime filter)
-df["atr_med"] = df["atr_14"].rolling(100).median()
-
-probs = model.predict_proba(X_test)[:, 1]
-
-signals = pd.DataFrame(index=X_test.index)
-signals["prob"] = probs
-
-# Command-line arguments
-TP_PCT = float(sys.argv[1]) if len(sys.argv) > 1 else 0.0023
-PROB_THRESHOLD = float(sys.argv[2]) if len(sys.argv) > 2 else 0.65
-LEVERAGE = float(sys.argv[3]) if len(sys.argv) > 3 else 3.0
-if LEVERAGE <= 0:
-    raise ValueError("LEVERAGE must be > 0")
-
-signals["atr"] = df.loc[signals.index, "atr_14"]
-signals["atr_med"] = df.loc[signals.index, "atr_med"]
-
-signals["enter"] = (
-    (signals["prob"] > PROB_THRESHOLD)
-    & (signals["atr"] > 1.2 * signals["atr_med"])
-)
 
 SL_PCT = 0.0008
 MAX_HOLD = 5
 FEE_PCT = 0.0004  # 0.04% per side (Binance-like)
-INITIAL_CAPITAL = float(sys.argv[4]) if len(sys.argv) > 4 else 1000.0
-CAPITAL_FRACTION = float(sys.argv[5]) if len(sys.argv) > 5 else 1.0
-if INITIAL_CAPITAL <= 0:
-    raise ValueError("INITIAL_CAPITAL must be > 0")
-if not (0 < CAPITAL_FRACTION <= 1):
-    raise ValueError("CAPITAL_FRACTION must be in (0, 1]")
-
-trades = []
-current_capital = INITIAL_CAPITAL
-
-for entry_time in signals[signals["enter"]].index:
-    if current_capital <= 0:
-        break
-
-    entry_price = df.loc[entry_time, "close"]
-    tp_price = entry_price * (1 + TP_PCT)
-    sl_price = entry_price * (1 - SL_PCT)
-
-    future = df.loc[entry_time:].iloc[1 : MAX_HOLD + 1]
-    if future.empty:
-        continue
-
-    exit_price = None
-    exit_time = None
-    result = "timeout"
-
-    for ts, row in future.iterrows():
-        if row["high"] >= tp_price:
-            exit_price = tp_price
-            exit_time = ts
-            result = "tp"
-            break
-        if row["low"] <= sl_price:
-            exit_price = sl_price
-            exit_time = ts
-            result = "sl"
+
+
+def simulate_leveraged(
+    df,
+    X_test,
+    probs,
+    tp_pct=0.0023,
+    prob_threshold=0.65,
+    leverage=3.0,
+    initial_capital=1000.0,
+    capital_fraction=1.0,
+    regime=None,
+):
+    """Simulate leveraged trades on preloaded data and return the trade log.
+
+    Position size compounds on current capital: each trade commits
+    ``capital_fraction`` of it as margin at ``leverage``. Pass ``regime``
+    from compute_atr_regime(df) to reuse it across runs.
+    """
+    if leverage <= 0:
+        raise ValueError("LEVERAGE must be > 0")
+    if initial_capital <= 0:
+        raise ValueError("INITIAL_CAPITAL must be > 0")
+    if not (0 < capital_fraction <= 1):
+        raise ValueError("CAPITAL_FRACTION must be in (0, 1]")
+
+    if regime is None:
+        regime = compute_atr_regime(df)
+
+    signals = entry_signals(X_test.index, probs, regime, prob_threshold)
+    exits = resolve_exits(df, signals[signals["enter"]].index, tp_pct, SL_PCT, MAX_HOLD)
+
+    trades = []
+    current_capital = initial_capital
+
+    for entry_time, exit_time, entry_price, exit_price, result in zip(
+        exits["entry_time"],
+        exits["exit_time"],
+        exits["entry_price"].tolist(),
+        exits["exit_price"].tolist(),
+        exits["result"],
+    ):
+        if current_capital <= 0:
             break
 
-    if exit_price is None:
-        exit_price = future.iloc[-1]["close"]
-        exit_time = future.index[-1]
-
-    # Position sizing based on current capital and leverage (notional exposure).
-    capital_before = current_capital
-    margin_used = capital_before * CAPITAL_FRACTION
-    entry_notional = margin_used * LEVERAGE
-    quantity = entry_notional / entry_price
-    exit_notional = abs(quantity * exit_price)
-
-    gross_pnl_usd = (exit_price - entry_price) * quantity
-    entry_fee_usd = entry_notional * FEE_PCT
-    exit_fee_usd = exit_notional * FEE_PCT
-    total_fees_usd = entry_fee_usd + exit_fee_usd
-    net_pnl_usd = gross_pnl_usd - total_fees_usd
-
-    capital_after = max(capital_before + net_pnl_usd, 0.0)
-    pnl_return = (capital_after - capital_before) / capital_before
-    gross_ret = (exit_price - entry_price) / entry_price
-    net_ret = net_pnl_usd / capital_before
-
-    trades.append(
-        {
-            "entry_time": entry_time,
-            "exit_time": exit_time,
-            "entry_price": entry_price,
-            "exit_price": exit_price,
-            "result": result,
-            "gross_return": gross_ret,
-            "net_return": net_ret,
-            "leveraged_return": pnl_return,
-            "leverage": LEVERAGE,
-            "margin_used": margin_used,
-            "position_notional": entry_notional,
-            "quantity": quantity,
-            "gross_pnl_usd": gross_pnl_usd,
-            "entry_fee_usd": entry_fee_usd,
-            "exit_fee_usd": exit_fee_usd,
-            "fees_usd": total_fees_usd,
-            "pnl_usd": net_pnl_usd,
-            "capital_before": capital_before,
-            "capital_after": capital_after,
-            "pnl": pnl_return,
-            "equity_capital": capital_after,
-            "equity": capital_after / INITIAL_CAPITAL,
-        }
+        # Position sizing based on current capital and leverage (notional exposure).
+        capital_before = current_capital
+        margin_used = capital_before * capital_fraction
+        entry_notional = margin_used * leverage
+        quantity = entry_notional / entry_price
+        exit_notional = abs(quantity * exit_price)
+
+        gross_pnl_usd = (exit_price - entry_price) * quantity
+        entry_fee_usd = entry_notional * FEE_PCT
+        exit_fee_usd = exit_notional * FEE_PCT
+        total_fees_usd = entry_fee_usd + exit_fee_usd
+        net_pnl_usd = gross_pnl_usd - total_fees_usd
+
+        capital_after = max(capital_before + net_pnl_usd, 0.0)
+        pnl_return = (capital_after - capital_before) / capital_before
+        gross_ret = (exit_price - entry_price) / entry_price
+        net_ret = net_pnl_usd / capital_before
+
+        trades.append(
+            {
+                "entry_time": entry_time,
+                "exit_time": exit_time,
+                "entry_price": entry_price,
+                "exit_price": exit_price,
+                "result": result,
+                "gross_return": gross_ret,
+                "net_return": net_ret,
+                "leveraged_return": pnl_return,
+                "leverage": leverage,
+                "margin_used": margin_used,
+                "position_notional": entry_notional,
+                "quantity": quantity,
+                "gross_pnl_usd": gross_pnl_usd,
+                "entry_fee_usd": entry_fee_usd,
+                "exit_fee_usd": exit_fee_usd,
+                "fees_usd": total_fees_usd,
+                "pnl_usd": net_pnl_usd,
+                "capital_before": capital_before,
+                "capital_after": capital_after,
+                "pnl": pnl_return,
+                "equity_capital": capital_after,
+                "equity": capital_after / initial_capital,
+            }
+        )
+
+        current_capital = capital_after
+
+    trades_df = pd.DataFrame(trades)
+
+    if not trades_df.empty:
+        trades_df["peak"] = trades_df["equity"].cummax()
+        trades_df["drawdown"] = trades_df["equity"] / trades_df["peak"] - 1
+
+    return trades_df
+
+
+def main():
+    # Command-line arguments
+    parser = argparse.ArgumentParser(description="Leveraged trade simulation on the test split.")
+    parser.add_argument("tp_pct", nargs="?", type=float, default=0.0023, help="Take-profit percentage.")
+    parser.add_argument("prob_threshold", nargs="?", type=float, default=0.65, help="Minimum model probability.")
+    parser.add_argument("leverage", nargs="?", type=float, default=3.0, help="Leverage multiple.")
+    parser.add_argument("initial_capital", nargs="?", type=float, default=1000.0, help="Starting capital (USD).")
+    parser.add_argument("capital_fraction", nargs="?", type=float, default=1.0, help="Capital share used as margin.")
+    parser.add_argument(
+        "--probs",
+        default=None,
+        help="Out-of-sample probabilities from walk_forward.py, simulated instead of the test split.",
+    )
+    args = parser.parse_args()
+    tp_pct, prob_threshold = args.tp_pct, args.prob_threshold
+    leverage, initial_capital, capital_fraction = args.leverage, args.initial_capital, args.capital_fraction
+
+    # Load market data
+    df = load_market_data()
+
+    if args.probs:
+        # Walk-forward probabilities cover every out-of-sample row, not just the test split
+        inputs = load_oos_inputs(args.probs, df=df)
+        X_test = pd.DataFrame(index=inputs.index)
+    else:
+        # Load test features
+        X_test = pd.read_parquet("data/splits/X_test.parquet")
+
+        # Model probabilities and ATR regime, cached per model and test split
+        inputs = load_signal_inputs(X_test, df=df)
+    report_memory("simulation", raw=df, X_test=X_test, signal_inputs=inputs)
+
+    trades_df = simulate_leveraged(
+        df,
+        X_test,
+        inputs["prob"].values,
+        tp_pct,
+        prob_threshold,
+        leverage=leverage,
+        initial_capital=initial_capital,
+        capital_fraction=capital_fraction,
+        regime=inputs,
     )
 
-    current_capital = capital_after
+    print("Total trades:", len(trades_df))
+    os.makedirs("data/results", exist_ok=True)
 
-trades_df = pd.DataFrame(trades)
+    if trades_df.empty:
+        print("No trades executed")
 
-print("Total trades:", len(trades_df))
-os.makedirs("data/results", exist_ok=True)
+        avg_return = 0.0
+        win_rate = 0.0
+        final_equity = 1.0
+        final_capital = initial_capital
+        max_drawdown = 0.0
 
-if trades_df.empty:
-    print("No trades executed")
+        print("\nAverage leveraged return:", avg_return)
+        print("Win rate:", win_rate)
+        print("\nFinal equity:", final_equity)
+        print("Final capital:", final_capital)
+        print("Max drawdown:", max_drawdown)
 
-    avg_return = 0.0
-    win_rate = 0.0
-    final_equity = 1.0
-    final_capital = INITIAL_CAPITAL
-    max_drawdown = 0.0
+        trades_df.to_parquet("data/results/trades_leverage.parquet")
 
-    print("\nAverage leveraged return:", avg_return)
-    print("Win rate:", win_rate)
-    print("\nFinal equity:", final_equity)
-    print("Final capital:", final_capital)
-    print("Max drawdown:", max_drawdown)
+        print("Leveraged trades saved")
+        return
 
-    trades_df.to_parquet("data/results/trades_leverage.parquet")
+    print("\nAverage leveraged return:", trades_df["pnl"].mean())
+    print("Win rate:", (trades_df["pnl"] > 0).mean())
+    print("\nFinal equity:", trades_df["equity"].iloc[-1])
+    print("Final capital:", trades_df["equity_capital"].iloc[-1])
 
-    print("Leveraged trades saved")
-    sys.exit(0)
-
-print("\nAverage leveraged return:", trades_df["pnl"].mean())
-print("Win rate:", (trades_df["pnl"] > 0).mean())
-print("\nFinal equity:", trades_df["equity"].iloc[-1])
-print("Final capital:", trades_df["equity_capital"].iloc[-1])
+    print("Max drawdown:", trades_df["drawdown"].min())
 
-trades_df["peak"] = trades_df["equity"].cummax()
-trades_df["drawdown"] = trades_df["equity"] / trades_df["peak"] - 1
+    trades_df.to_parquet("data/results/trades_leverage.parquet")
 
-print("Max drawdown:", trades_df["drawdown"].min())
+    print("Leveraged trades saved")
 
-trades_df.to_parquet("data/results/trades_leverage.parquet")
 
-print("Leveraged trades saved")
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,49 @@
+import argparse
+import os
+
 import pandas as pd
 
+from features import load_features
+from labeling import SL_PCT, select_label
+from storage import DEFAULT_PRECISION, PRECISIONS, apply_precision, report_memory
 
-def main():
-    data = pd.read_parquet("data/labeled/btcusdt_labeled.parquet")
 
+SPLITS_DIR = "data/splits"
+
+
+def load_labeled(label_matrix=None, tp_pct=None, sl_pct=SL_PCT):
+    if label_matrix is None:
+        return pd.read_parquet("data/labeled/btcusdt_labeled.parquet")
+
+    if tp_pct is None:
+        raise ValueError("--tp is required with --label-matrix")
+
+    X = load_features("data/features/btcusdt_features.parquet")
+    matrix = pd.read_parquet(label_matrix)
+    print(f"Selecting labels TP={tp_pct}, SL={sl_pct} from {label_matrix}")
+    return select_label(X, matrix, tp_pct, sl_pct)
+
+
+def add_label_args(parser):
+    """``--label-matrix/--tp/--sl`` options selecting the labels load_labeled returns."""
+    parser.add_argument(
+        "--label-matrix",
+        default=None,
+        help="Optional label matrix from labeling.py --tp-grid. Selects one column instead of the labeled dataset.",
+    )
+    parser.add_argument("--tp", type=float, default=None, help="TP column to select from --label-matrix.")
+    parser.add_argument("--sl", type=float, default=SL_PCT, help="SL column to select from --label-matrix.")
+
+
+def split_dataset(data, verbose=True):
+    """Time-ordered 70/15/15 split into X_/y_ train, val and test."""
     # Ensure time order
     data = data.sort_index()
 
-    print("Start:", data.index.min())
-    print("End:  ", data.index.max())
-    print("Rows: ", len(data))
+    if verbose:
+        print("Start:", data.index.min())
+        print("End:  ", data.index.max())
+        print("Rows: ", len(data))
 
     n = len(data)
 
@@ -20,33 +54,53 @@ def main():
     val_data = data.iloc[train_end:val_end]
     test_data = data.iloc[val_end:]
 
-    X_train = train_data.drop(columns=["label"])
-    y_train = train_data["label"]
+    splits = {
+        "X_train": train_data.drop(columns=["label"]),
+        "y_train": train_data["label"],
+        "X_val": val_data.drop(columns=["label"]),
+        "y_val": val_data["label"],
+        "X_test": test_data.drop(columns=["label"]),
+        "y_test": test_data["label"],
+    }
 
-    X_val = val_data.drop(columns=["label"])
-    y_val = val_data["label"]
+    if verbose:
+        print("\nSplit sizes:")
+        print("Train:", splits["X_train"].shape)
+        print("Val:  ", splits["X_val"].shape)
+        print("Test: ", splits["X_test"].shape)
 
-    X_test = test_data.drop(columns=["label"])
-    y_test = test_data["label"]
+        print("\nDate ranges:")
+        for name, key in (("Train:", "X_train"), ("Val:  ", "X_val"), ("Test: ", "X_test")):
+            print(name, splits[key].index.min(), "->", splits[key].index.max())
 
-    print("\nSplit sizes:")
-    print("Train:", X_train.shape)
-    print("Val:  ", X_val.shape)
-    print("Test: ", X_test.shape)
+    return splits
 
-    print("\nDate ranges:")
-    print("Train:", X_train.index.min(), "->", X_train.index.max())
-    print("Val:  ", X_val.index.min(), "->", X_val.index.max())
-    print("Test: ", X_test.index.min(), "->", X_test.index.max())
 
-    X_train.to_parquet("data/splits/X_train.parquet")
-    y_train.to_frame("label").to_parquet("data/splits/y_train.parquet")
+def save_splits(splits, splits_dir=SPLITS_DIR):
+    os.makedirs(splits_dir, exist_ok=True)
+    for name, frame in splits.items():
+        if name.startswith("y_"):
+            frame = frame.to_frame("label")
+        frame.to_parquet(os.path.join(splits_dir, f"{name}.parquet"))
 
-    X_val.to_parquet("data/splits/X_val.parquet")
-    y_val.to_frame("label").to_parquet("data/splits/y_val.parquet")
 
-    X_test.to_parquet("data/splits/X_test.parquet")
-    y_test.to_frame("label").to_parquet("data/splits/y_test.parquet")
+def main():
+    parser = argparse.ArgumentParser(description="Time-ordered train/val/test split of the labeled dataset.")
+    add_label_args(parser)
+    parser.add_argument("--splits-dir", default=SPLITS_DIR, help="Output directory for split files.")
+    parser.add_argument(
+        "--precision",
+        choices=PRECISIONS,
+        default=DEFAULT_PRECISION,
+        help="Float dtype for stored feature columns (label is always int8).",
+    )
+    args = parser.parse_args()
+
+    data = apply_precision(load_labeled(args.label_matrix, args.tp, args.sl), args.precision)
+
+    splits = split_dataset(data)
+    save_splits(splits, args.splits_dir)
+    report_memory("split", labeled=data, splits=splits)
 
     print("Splits saved")
 
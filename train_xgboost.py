@@ -1,44 +1,70 @@
-import pandas as pd
-import joblib
+import argparse
 import os
 
+import joblib
+import pandas as pd
+
 from xgboost import XGBClassifier
 from sklearn.metrics import precision_score, recall_score, classification_report
 
-def main():
-    # =====================
-    # Load data
-    # =====================
-    X_train = pd.read_parquet("data/splits/X_train.parquet")
-    y_train = pd.read_parquet("data/splits/y_train.parquet")["label"].values
+from inference import export_native
+from model_registry import ModelRegistry, training_key
+from storage import report_memory
+
+
+SPLITS_DIR = "data/splits"
+MODEL_PATH = "data/models/xgb_tp_sl_model.pkl"
+
+MODEL_PARAMS = {
+    "max_depth": 4,
+    "learning_rate": 0.05,
+    "n_estimators": 300,
+    "subsample": 0.8,
+    "colsample_bytree": 0.8,
+    "objective": "binary:logistic",
+    "eval_metric": "logloss",
+    "random_state": 42,
+}
+
+
+def load_splits(splits_dir=SPLITS_DIR):
+    splits = {}
+    for part in ("train", "val", "test"):
+        splits[f"X_{part}"] = pd.read_parquet(os.path.join(splits_dir, f"X_{part}.parquet"))
+        splits[f"y_{part}"] = pd.read_parquet(os.path.join(splits_dir, f"y_{part}.parquet"))["label"].values
+    return splits
+
 
-    X_val = pd.read_parquet("data/splits/X_val.parquet")
-    y_val = pd.read_parquet("data/splits/y_val.parquet")["label"].values
+def train_model(splits, n_jobs=-1, verbose=True, registry=None):
+    """Fit the XGBoost classifier on the train split and report val/test metrics.
 
-    X_test = pd.read_parquet("data/splits/X_test.parquet")
-    y_test = pd.read_parquet("data/splits/y_test.parquet")["label"].values
+    With a ModelRegistry, a model already trained on the same train/val
+    splits and MODEL_PARAMS is loaded instead of refitted.
+    """
+    X_train, y_train = splits["X_train"], splits["y_train"]
+    X_val, y_val = splits["X_val"], splits["y_val"]
+    X_test, y_test = splits["X_test"], splits["y_test"]
 
     # =====================
     # Train model
     # =====================
-    model = XGBClassifier(
-        max_depth=4,
-        learning_rate=0.05,
-        n_estimators=300,
-        subsample=0.8,
-        colsample_bytree=0.8,
-        objective="binary:logistic",
-        eval_metric="logloss",
-        random_state=42,
-        n_jobs=-1
-    )
-
-    model.fit(
-        X_train,
-        y_train,
-        eval_set=[(X_val, y_val)],
-        verbose=True
-    )
+    key = training_key(splits, MODEL_PARAMS) if registry is not None else None
+    model = registry.get(key) if registry is not None else None
+
+    if model is not None:
+        print(f"Loaded trained model from registry: {key}")
+    else:
+        model = XGBClassifier(**MODEL_PARAMS, n_jobs=n_jobs)
+
+        model.fit(
+            X_train,
+            y_train,
+            eval_set=[(X_val, y_val)],
+            verbose=verbose
+        )
+        if registry is not None:
+            registry.put(key, model, MODEL_PARAMS)
+            print(f"Stored trained model in registry: {key}")
 
     # =====================
     # Validation evaluation
@@ -74,12 +100,42 @@ def main():
     print("\nClassification report (TEST):")
     print(classification_report(y_test, test_preds))
 
+    return model
+
+
+def save_model(model, model_path=MODEL_PATH):
+    os.makedirs(os.path.dirname(model_path) or ".", exist_ok=True)
+    joblib.dump(model, model_path)
+    # Native copy for the live inference path (inference.load_predictor).
+    export_native(model_path, model)
+    print(f"\nModel saved to {model_path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Train and evaluate the XGBoost TP/SL classifier.")
+    parser.add_argument("--splits-dir", default=SPLITS_DIR, help="Directory with train/val/test split files.")
+    parser.add_argument("--model-path", default=MODEL_PATH, help="Output path for the trained model.")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="XGBoost threads (-1 uses all cores).")
+    parser.add_argument(
+        "--no-registry",
+        action="store_true",
+        help="Always retrain instead of reusing a registry model trained on the same splits and parameters.",
+    )
+    args = parser.parse_args()
+
+    # =====================
+    # Load data
+    # =====================
+    splits = load_splits(args.splits_dir)
+    report_memory("training", splits=splits)
+
+    registry = None if args.no_registry else ModelRegistry()
+    model = train_model(splits, n_jobs=args.n_jobs, registry=registry)
+
     # =====================
     # Save trained model
     # =====================
-    os.makedirs("data/models", exist_ok=True)
-    joblib.dump(model, "data/models/xgb_tp_sl_model.pkl")
-    print("\nModel saved to data/models/xgb_tp_sl_model.pkl")
+    save_model(model, args.model_path)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,202 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.metrics import log_loss, precision_score, recall_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from storage import report_memory
+from train_xgboost import MODEL_PARAMS, SPLITS_DIR, load_splits
+
+
+SEARCH_DIR = "data/models/search"
+
+SEARCH_SPACE = {
+    "max_depth": [3, 4, 5, 6],
+    "learning_rate": [0.03, 0.05, 0.1],
+    "subsample": [0.7, 0.8, 1.0],
+    "colsample_bytree": [0.6, 0.8, 1.0],
+    "min_child_weight": [1, 5, 20],
+}
+
+MAX_ROUNDS = 2000
+EARLY_STOPPING_ROUNDS = 50
+MAX_BIN = 256
+
+
+def build_matrices(splits, max_bin=MAX_BIN):
+    """Quantized train matrix and a val matrix sharing its bin cuts, built once per search."""
+    dtrain = xgb.QuantileDMatrix(splits["X_train"], splits["y_train"], max_bin=max_bin)
+    dval = xgb.QuantileDMatrix(splits["X_val"], splits["y_val"], ref=dtrain)
+    return dtrain, dval
+
+
+def search_configs(space=SEARCH_SPACE, trials=None, seed=42):
+    """Every configuration of ``space``, or ``trials`` sampled without replacement."""
+    if trials is None:
+        return list(ParameterGrid(space))
+    return list(ParameterSampler(space, n_iter=trials, random_state=seed))
+
+
+def booster_params(config, nthread):
+    return {
+        "objective": MODEL_PARAMS["objective"],
+        "eval_metric": MODEL_PARAMS["eval_metric"],
+        "seed": MODEL_PARAMS["random_state"],
+        "tree_method": "hist",
+        "max_bin": MAX_BIN,
+        "nthread": nthread,
+        **config,
+    }
+
+
+def run_trial(
+    config,
+    dtrain,
+    dval,
+    X_val,
+    y_val,
+    nthread,
+    max_rounds=MAX_ROUNDS,
+    early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+):
+    """Train one configuration with early stopping on val; returns (leaderboard row, best booster)."""
+    start = time.perf_counter()
+    booster = xgb.train(
+        booster_params(config, nthread),
+        dtrain,
+        num_boost_round=max_rounds,
+        evals=[(dval, "val")],
+        early_stopping_rounds=early_stopping_rounds,
+        verbose_eval=False,
+    )
+    booster = booster[: booster.best_iteration + 1]
+
+    val_probs = booster.inplace_predict(X_val)
+    val_preds = (val_probs >= 0.5).astype(int)
+    row = {
+        **config,
+        "rounds": booster.num_boosted_rounds(),
+        "val_logloss": log_loss(y_val, val_probs, labels=[0, 1]),
+        "val_precision": precision_score(y_val, val_preds, pos_label=1, zero_division=0),
+        "val_recall": recall_score(y_val, val_preds, pos_label=1, zero_division=0),
+        "seconds": time.perf_counter() - start,
+    }
+    return row, booster
+
+
+def to_classifier(booster):
+    """Wrap a booster as the XGBClassifier the simulations and prob cache load."""
+    model = xgb.XGBClassifier()
+    model.load_model(bytearray(booster.save_raw("json")))
+    return model
+
+
+def search(
+    splits,
+    configs,
+    concurrency=1,
+    n_jobs=None,
+    max_rounds=MAX_ROUNDS,
+    early_stopping_rounds=EARLY_STOPPING_ROUNDS,
+):
+    """Evaluate ``configs`` on shared quantized matrices, ``concurrency`` trials at a time.
+
+    Each trial gets ``n_jobs // concurrency`` threads (all cores by default);
+    XGBoost releases the GIL while training, so trials run in threads that
+    share one copy of the matrices. Returns the leaderboard, best first, and
+    the best model as an XGBClassifier.
+    """
+    n_jobs = n_jobs or os.cpu_count() or 1
+    nthread = max(1, n_jobs // concurrency)
+
+    dtrain, dval = build_matrices(splits)
+    X_val = np.ascontiguousarray(splits["X_val"].to_numpy(dtype=np.float32))
+    y_val = np.asarray(splits["y_val"])
+
+    def trial(config):
+        return run_trial(config, dtrain, dval, X_val, y_val, nthread, max_rounds, early_stopping_rounds)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(trial, configs))
+
+    leaderboard = pd.DataFrame([row for row, _ in results])
+    leaderboard.insert(0, "trial", range(len(results)))
+    leaderboard = leaderboard.sort_values(["val_logloss", "trial"]).reset_index(drop=True)
+    best = results[int(leaderboard.loc[0, "trial"])][1]
+    return leaderboard, to_classifier(best)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Hyperparameter search for the XGBoost TP/SL classifier with early stopping on val."
+    )
+    parser.add_argument("--splits-dir", default=SPLITS_DIR, help="Directory with train/val/test split files.")
+    parser.add_argument("--output-dir", default=SEARCH_DIR, help="Where the leaderboard and best model are written.")
+    parser.add_argument(
+        "--trials",
+        type=int,
+        default=20,
+        help="Configurations sampled from SEARCH_SPACE. 0 evaluates the full grid.",
+    )
+    parser.add_argument("--seed", type=int, default=42, help="Seed for sampling configurations.")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=min(4, os.cpu_count() or 1),
+        help="Trials trained at the same time; cores are split between them.",
+    )
+    parser.add_argument("--n-jobs", type=int, default=None, help="Total XGBoost threads (default: all cores).")
+    parser.add_argument("--max-rounds", type=int, default=MAX_ROUNDS, help="Boosting round cap per trial.")
+    parser.add_argument(
+        "--early-stopping-rounds",
+        type=int,
+        default=EARLY_STOPPING_ROUNDS,
+        help="Stop a trial after this many rounds without val logloss improvement.",
+    )
+    args = parser.parse_args()
+
+    if args.concurrency < 1:
+        raise ValueError("--concurrency must be >= 1")
+
+    splits = load_splits(args.splits_dir)
+    report_memory("search", splits=splits)
+
+    configs = search_configs(trials=args.trials or None, seed=args.seed)
+    print(f"Evaluating {len(configs)} configuration(s), {args.concurrency} at a time")
+
+    leaderboard, model = search(
+        splits,
+        configs,
+        concurrency=args.concurrency,
+        n_jobs=args.n_jobs,
+        max_rounds=args.max_rounds,
+        early_stopping_rounds=args.early_stopping_rounds,
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    leaderboard_path = os.path.join(args.output_dir, "leaderboard.csv")
+    model_path = os.path.join(args.output_dir, "best_model.pkl")
+    leaderboard.to_csv(leaderboard_path, index=False)
+    joblib.dump(model, model_path)
+
+    best_params = {key: leaderboard.loc[0, key].item() for key in SEARCH_SPACE}
+    best_params["n_estimators"] = int(leaderboard.loc[0, "rounds"])
+    with open(os.path.join(args.output_dir, "best_params.json"), "w") as f:
+        json.dump(best_params, f, indent=2)
+
+    print("\nLEADERBOARD (top 10 by val logloss)")
+    print(leaderboard.head(10).round(4).to_string(index=False))
+    print("\nBest parameters:", best_params)
+    print("Leaderboard saved to:", leaderboard_path)
+    print("Best model saved to:", model_path)
+
+
+if __name__ == "__main__":
+    main()
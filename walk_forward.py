@@ -0,0 +1,177 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.metrics import log_loss, precision_score, recall_score
+from xgboost import XGBClassifier
+
+from labeling import MAX_HOLD
+from storage import report_memory
+from train_test_split import add_label_args, load_labeled
+from train_xgboost import MODEL_PARAMS
+
+
+WALK_FORWARD_DIR = "data/walk_forward"
+WINDOWS = ("expanding", "rolling")
+FOLD_ROUNDS = 30
+
+
+def walk_forward_folds(n, folds=5, initial_fraction=0.5, window="expanding"):
+    """(train_start, test_start, test_end) row positions of each fold, in time order.
+
+    The rows after the first ``initial_fraction`` are cut into ``folds``
+    consecutive test windows; the first fold trains on the initial rows.
+    Later folds warm-start the previous booster, so with an ``expanding``
+    window they only boost on the rows that arrived since the previous fold
+    (earlier rows are already in the booster). A ``rolling`` window boosts
+    on the most recent ``initial_fraction`` of rows.
+    """
+    if window not in WINDOWS:
+        raise ValueError(f"window must be one of {WINDOWS}")
+    initial = int(n * initial_fraction)
+    edges = np.linspace(initial, n, folds + 1).astype(int).tolist()
+    starts = [0, *edges[:-2]] if window == "expanding" else [0, *(edge - initial for edge in edges[1:-1])]
+    return list(zip(starts, edges[:-1], edges[1:]))
+
+
+def fit_increment(X, y, booster=None, rounds=None, n_jobs=-1):
+    """Fit MODEL_PARAMS trees on (X, y), continuing from ``booster`` when given.
+
+    The first fit grows MODEL_PARAMS["n_estimators"] trees; later fits only
+    add ``rounds`` trees on top of the previous booster.
+    """
+    params = dict(MODEL_PARAMS)
+    if booster is not None:
+        params["n_estimators"] = rounds
+    model = XGBClassifier(**params, n_jobs=n_jobs)
+    model.fit(X, y, xgb_model=booster, verbose=False)
+    return model
+
+
+def walk_forward(
+    data,
+    folds=5,
+    initial_fraction=0.5,
+    window="expanding",
+    fold_rounds=FOLD_ROUNDS,
+    n_jobs=-1,
+    max_hold=MAX_HOLD,
+):
+    """Walk-forward training with one booster carried across folds.
+
+    Before each test window the booster is warm-started on that fold's
+    training rows (see walk_forward_folds), so the first fold costs one full
+    fit and every later fold ``fold_rounds`` trees on a slice of the data.
+    Training rows are purged like purged_cv.purged_ranges does: a row at t
+    is labeled from candles (t, t + max_hold], so rows within ``max_hold``
+    minutes of the test start are held back until a later fold. Returns the
+    out-of-sample probabilities (``prob`` and ``fold`` per test row), a
+    per-fold summary and the final model, which has also been updated on the
+    last test window.
+    """
+    data = data.sort_index()
+    X, y = data.drop(columns=["label"]), data["label"]
+    minutes = data.index.as_unit("s").asi8 // 60
+
+    model = None
+    boosted_end = 0
+    probs, summary = [], []
+    for fold, (train_start, test_start, test_end) in enumerate(
+        walk_forward_folds(len(data), folds, initial_fraction, window)
+    ):
+        start = time.perf_counter()
+        train_end = int(np.searchsorted(minutes, minutes[test_start] - max_hold, side="left"))
+        if window == "expanding":
+            # Rows purged from the previous fold are boosted now that their labels are in the past.
+            train_start = boosted_end
+        booster = None if model is None else model.get_booster()
+        model = fit_increment(
+            X.iloc[train_start:train_end], y.iloc[train_start:train_end], booster, fold_rounds, n_jobs
+        )
+        boosted_end = train_end
+
+        X_test, y_test = X.iloc[test_start:test_end], y.iloc[test_start:test_end]
+        fold_probs = model.predict_proba(X_test)[:, 1]
+        preds = (fold_probs >= 0.5).astype(int)
+        probs.append(pd.DataFrame({"prob": fold_probs, "fold": np.int16(fold)}, index=X_test.index))
+        summary.append({
+            "fold": fold,
+            "train_start": X.index[train_start],
+            "train_end": X.index[train_end - 1],
+            "test_start": X_test.index[0],
+            "test_end": X_test.index[-1],
+            "boosted_rows": train_end - train_start,
+            "purged_rows": test_start - train_end,
+            "test_rows": len(X_test),
+            "trees": model.get_booster().num_boosted_rounds(),
+            "test_logloss": log_loss(y_test, fold_probs, labels=[0, 1]),
+            "test_precision": precision_score(y_test, preds, pos_label=1, zero_division=0),
+            "test_recall": recall_score(y_test, preds, pos_label=1, zero_division=0),
+            "seconds": time.perf_counter() - start,
+        })
+
+    # One more increment brings the deployable model up to the end of the data,
+    # starting after the last boosted row so the purged rows are not skipped.
+    final_start = boosted_end if window == "expanding" else len(data) - int(len(data) * initial_fraction)
+    model = fit_increment(X.iloc[final_start:], y.iloc[final_start:], model.get_booster(), fold_rounds, n_jobs)
+
+    return pd.concat(probs), pd.DataFrame(summary), model
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Walk-forward retraining with warm-started boosters and out-of-sample probabilities."
+    )
+    add_label_args(parser)
+    parser.add_argument("--folds", type=int, default=5, help="Consecutive out-of-sample test windows.")
+    parser.add_argument(
+        "--initial-fraction",
+        type=float,
+        default=0.5,
+        help="Share of rows used to train the first fold (and the rolling window length).",
+    )
+    parser.add_argument("--window", choices=WINDOWS, default="expanding", help="Training window per fold.")
+    parser.add_argument(
+        "--fold-rounds",
+        type=int,
+        default=FOLD_ROUNDS,
+        help="Trees added per fold on top of the previous booster.",
+    )
+    parser.add_argument("--output-dir", default=WALK_FORWARD_DIR, help="Where probabilities, folds and model go.")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="XGBoost threads (-1 uses all cores).")
+    args = parser.parse_args()
+
+    if args.folds < 1:
+        raise ValueError("--folds must be >= 1")
+    if not (0 < args.initial_fraction < 1):
+        raise ValueError("--initial-fraction must be in (0, 1)")
+
+    data = load_labeled(args.label_matrix, args.tp, args.sl)
+    report_memory("walk-forward", labeled=data)
+
+    probs, summary, model = walk_forward(
+        data,
+        folds=args.folds,
+        initial_fraction=args.initial_fraction,
+        window=args.window,
+        fold_rounds=args.fold_rounds,
+        n_jobs=args.n_jobs,
+    )
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    probs_path = os.path.join(args.output_dir, "oos_probs.parquet")
+    probs.to_parquet(probs_path)
+    summary.to_csv(os.path.join(args.output_dir, "folds.csv"), index=False)
+    joblib.dump(model, os.path.join(args.output_dir, "model.pkl"))
+
+    print(summary.round({"test_logloss": 4, "test_precision": 4, "test_recall": 4, "seconds": 3}).to_string(index=False))
+    print(f"\nTotal training time: {summary['seconds'].sum():.2f}s over {len(summary)} folds")
+    print("Out-of-sample probabilities saved to:", probs_path)
+    print("Simulate them with: python trade_simulation.py 0.0023 0.65 --probs", probs_path)
+
+
+if __name__ == "__main__":
+    main()